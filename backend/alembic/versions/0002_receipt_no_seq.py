@@ -0,0 +1,33 @@
+"""receipt number sequence
+
+Revision ID: 0002_receipt_no_seq
+Revises: 0001_init_schema
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0002_receipt_no_seq"
+down_revision = "0001_init_schema"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE IF NOT EXISTS receipt_no_seq AS BIGINT START WITH 1")
+    # Continue numbering after whatever the row-lock allocator already handed out.
+    op.execute(
+        """
+        SELECT setval('receipt_no_seq', GREATEST(current_number, 1), current_number > 0)
+        FROM receipt_sequence
+        WHERE id = 1
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP SEQUENCE IF EXISTS receipt_no_seq")
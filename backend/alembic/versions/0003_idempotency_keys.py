@@ -0,0 +1,38 @@
+"""idempotency keys
+
+Revision ID: 0003_idempotency_keys
+Revises: 0002_receipt_no_seq
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003_idempotency_keys"
+down_revision = "0002_receipt_no_seq"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "idempotency_keys",
+        sa.Column("id", sa.Uuid(as_uuid=True), primary_key=True, nullable=False),
+        sa.Column("key", sa.String(length=255), nullable=False),
+        sa.Column("scope", sa.String(length=100), nullable=False),
+        sa.Column("payment_id", sa.Uuid(as_uuid=True), sa.ForeignKey("payments.id"), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_idempotency_keys_key", "idempotency_keys", ["key"], unique=True)
+    op.create_index("ix_idempotency_keys_expires_at", "idempotency_keys", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_idempotency_keys_expires_at", table_name="idempotency_keys")
+    op.drop_index("ix_idempotency_keys_key", table_name="idempotency_keys")
+    op.drop_table("idempotency_keys")
@@ -0,0 +1,25 @@
+"""payments keyset pagination index
+
+Revision ID: 0004_payments_paid_at_id
+Revises: 0003_idempotency_keys
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0004_payments_paid_at_id"
+down_revision = "0003_idempotency_keys"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE INDEX ix_payments_paid_at_id ON payments (paid_at DESC, id DESC)")
+
+
+def downgrade() -> None:
+    op.drop_index("ix_payments_paid_at_id", table_name="payments")
@@ -0,0 +1,93 @@
+"""student balance ledger
+
+Revision ID: 0005_student_balance
+Revises: 0004_payments_paid_at_id
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005_student_balance"
+down_revision = "0004_payments_paid_at_id"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "student_balance",
+        sa.Column(
+            "student_id",
+            sa.Uuid(as_uuid=True),
+            sa.ForeignKey("students.id", ondelete="CASCADE"),
+            primary_key=True,
+            nullable=False,
+        ),
+        sa.Column("expected_fee", sa.Numeric(12, 2), nullable=False, server_default="0"),
+        sa.Column("paid_total", sa.Numeric(12, 2), nullable=False, server_default="0"),
+        sa.Column("pending", sa.Numeric(12, 2), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+    )
+
+    op.execute(
+        """
+        INSERT INTO student_balance (student_id, expected_fee, paid_total, pending, updated_at)
+        SELECT
+            s.id,
+            COALESCE(sf.expected_fee_amount, 0),
+            COALESCE(p.paid_total, 0),
+            COALESCE(sf.expected_fee_amount, 0) - COALESCE(p.paid_total, 0),
+            NOW()
+        FROM students s
+        LEFT JOIN student_fee sf ON sf.student_id = s.id
+        LEFT JOIN (
+            SELECT student_id, SUM(amount) AS paid_total
+            FROM payments
+            GROUP BY student_id
+        ) p ON p.student_id = s.id
+        """
+    )
+
+    # Compatibility shim: same columns as before, now a join instead of an aggregate.
+    op.execute(
+        """
+        CREATE OR REPLACE VIEW student_balance_vw AS
+        SELECT
+            s.id AS student_id,
+            s.student_code,
+            s.name,
+            COALESCE(b.expected_fee, 0)::numeric(12,2) AS expected_fee,
+            COALESCE(b.paid_total, 0)::numeric(12,2) AS paid_total,
+            COALESCE(b.pending, 0)::numeric(12,2) AS pending
+        FROM students s
+        LEFT JOIN student_balance b ON b.student_id = s.id;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        CREATE OR REPLACE VIEW student_balance_vw AS
+        SELECT
+            s.id AS student_id,
+            s.student_code,
+            s.name,
+            COALESCE(sf.expected_fee_amount, 0)::numeric(12,2) AS expected_fee,
+            COALESCE(p.paid_total, 0)::numeric(12,2) AS paid_total,
+            (COALESCE(sf.expected_fee_amount, 0) - COALESCE(p.paid_total, 0))::numeric(12,2) AS pending
+        FROM students s
+        LEFT JOIN student_fee sf ON sf.student_id = s.id
+        LEFT JOIN (
+            SELECT student_id, SUM(amount) AS paid_total
+            FROM payments
+            GROUP BY student_id
+        ) p ON p.student_id = s.id;
+        """
+    )
+    op.drop_table("student_balance")
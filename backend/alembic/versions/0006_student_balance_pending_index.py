@@ -0,0 +1,27 @@
+"""partial index over outstanding balances
+
+Revision ID: 0006_balance_pending_index
+Revises: 0005_student_balance
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0006_balance_pending_index"
+down_revision = "0005_student_balance"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE INDEX ix_student_balance_pending ON student_balance (pending DESC) WHERE pending <> 0"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_student_balance_pending", table_name="student_balance")
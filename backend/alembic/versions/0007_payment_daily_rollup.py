@@ -0,0 +1,44 @@
+"""daily collection rollup
+
+Revision ID: 0007_payment_daily_rollup
+Revises: 0006_balance_pending_index
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0007_payment_daily_rollup"
+down_revision = "0006_balance_pending_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    payment_mode = postgresql.ENUM(
+        "cash", "upi", "bank", name="payment_mode", create_type=False
+    )
+    op.create_table(
+        "payment_daily_rollup",
+        sa.Column("day", sa.Date(), primary_key=True, nullable=False),
+        sa.Column("mode", payment_mode, primary_key=True, nullable=False),
+        sa.Column("total", sa.Numeric(14, 2), nullable=False, server_default="0"),
+        sa.Column("count", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.execute(
+        """
+        INSERT INTO payment_daily_rollup (day, mode, total, count)
+        SELECT date(timezone('UTC', paid_at)), mode, SUM(amount), COUNT(*)
+        FROM payments
+        GROUP BY 1, 2
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("payment_daily_rollup")
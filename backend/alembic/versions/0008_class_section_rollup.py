@@ -0,0 +1,43 @@
+"""class and section rollup
+
+Revision ID: 0008_class_section_rollup
+Revises: 0007_payment_daily_rollup
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008_class_section_rollup"
+down_revision = "0007_payment_daily_rollup"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "class_section_rollup",
+        sa.Column("class_name", sa.String(100), primary_key=True, nullable=False),
+        sa.Column("section", sa.String(50), primary_key=True, nullable=False),
+        sa.Column("student_count", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("expected_fee", sa.Numeric(14, 2), nullable=False, server_default="0"),
+        sa.Column("paid_total", sa.Numeric(14, 2), nullable=False, server_default="0"),
+    )
+    op.execute(
+        """
+        INSERT INTO class_section_rollup (class_name, section, student_count, expected_fee, paid_total)
+        SELECT COALESCE(s.class_name, ''), COALESCE(s.section, ''), COUNT(*),
+               SUM(b.expected_fee), SUM(b.paid_total)
+        FROM students s
+        JOIN student_balance b ON b.student_id = s.id
+        GROUP BY 1, 2
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("class_section_rollup")
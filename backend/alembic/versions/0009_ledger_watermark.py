@@ -0,0 +1,25 @@
+"""ledger watermark sequence
+
+Revision ID: 0009_ledger_watermark
+Revises: 0008_class_section_rollup
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0009_ledger_watermark"
+down_revision = "0008_class_section_rollup"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE IF NOT EXISTS ledger_watermark_seq AS BIGINT START WITH 1")
+
+
+def downgrade() -> None:
+    op.execute("DROP SEQUENCE IF EXISTS ledger_watermark_seq")
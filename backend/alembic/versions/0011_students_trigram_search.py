@@ -0,0 +1,35 @@
+"""trigram indexes for student search
+
+Revision ID: 0011_students_trigram
+Revises: 0010_export_jobs
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0011_students_trigram"
+down_revision = "0010_export_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Expression indexes matching the lower(...) LIKE '%term%' search filters.
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_students_code_trgm "
+        "ON students USING gin (lower(student_code) gin_trgm_ops)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_students_name_trgm "
+        "ON students USING gin (lower(name) gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_students_name_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_students_code_trgm")
@@ -1,15 +1,18 @@
 from __future__ import annotations
 
 import uuid
+from datetime import UTC, datetime
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.core.database import get_db
-from app.models.user import User
+from app.models.enums import UserRole
+from app.services import principals, watermark
+from app.services.principals import Principal
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -17,18 +20,47 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 def get_current_user(
     db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-) -> User:
+) -> Principal:
     try:
         payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
         sub = payload.get("sub")
         if not sub:
             raise ValueError("missing sub")
+        if payload.get("typ") == "refresh":
+            raise ValueError("refresh token used as an access token")
         user_id = uuid.UUID(sub)
+        if settings.jwt_trust_claims and payload.get("username") and payload.get("role"):
+            return Principal(id=user_id, username=payload["username"], role=UserRole(payload["role"]))
     except (JWTError, ValueError):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-    user = db.get(User, user_id)
+    # The session only checks out a connection on a cache miss.
+    user = principals.get(db, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     return user
 
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match calls for.
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def ledger_etag(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    _: Principal = Depends(get_current_user),
+) -> None:
+    # Answers a matching If-None-Match with 304 before the endpoint runs its queries.
+    # The UTC day is part of the tag because today/month totals roll over at midnight.
+    etag = f'W/"{watermark.current(db)}-{datetime.now(UTC):%Y%m%d}"'
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
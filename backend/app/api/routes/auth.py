@@ -1,28 +1,68 @@
 from __future__ import annotations
 
+import uuid
+
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from jose import JWTError, jwt
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_user
-from app.core.database import get_db
-from app.core.security import create_access_token, verify_password
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db
+from app.core.security import create_access_token, create_refresh_token
 from app.models.user import User
-from app.schemas.auth import LoginRequest, TokenResponse, UserMeResponse
+from app.schemas.auth import LoginRequest, RefreshRequest, TokenResponse, UserMeResponse
+from app.services import passwords, principals
+from app.services.principals import Principal
 
 
 router = APIRouter()
 
 
+def _access_token(user: User | Principal) -> str:
+    return create_access_token(
+        subject=str(user.id), claims={"username": user.username, "role": user.role.value}
+    )
+
+
+def _find_user(username: str) -> User | None:
+    with SessionLocal() as db:
+        return db.execute(select(User).where(User.username == username)).scalar_one_or_none()
+
+
 @router.post("/login", response_model=TokenResponse)
-def login(payload: LoginRequest, db: Session = Depends(get_db)) -> TokenResponse:
-    user = db.execute(select(User).where(User.username == payload.username)).scalar_one_or_none()
-    if not user or not verify_password(payload.password, user.password_hash):
+async def login(payload: LoginRequest) -> TokenResponse:
+    # Async so the bcrypt run is awaited on the event loop; only the lookup uses a
+    # threadpool thread, and its connection is back in the pool before hashing starts.
+    user = await run_in_threadpool(_find_user, payload.username)
+    if not user or not await passwords.verify(payload.password, user.password_hash):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    return TokenResponse(access_token=create_access_token(subject=str(user.id)))
+    return TokenResponse(
+        access_token=_access_token(user), refresh_token=create_refresh_token(subject=str(user.id))
+    )
+
+
+@router.post("/refresh", response_model=TokenResponse)
+def refresh(payload: RefreshRequest, db: Session = Depends(get_db)) -> TokenResponse:
+    # A new access token, no password check; the refresh token itself is not rotated.
+    try:
+        claims = jwt.decode(
+            payload.refresh_token, settings.jwt_secret, algorithms=[settings.jwt_algorithm]
+        )
+        if claims.get("typ") != "refresh" or not claims.get("sub"):
+            raise ValueError("not a refresh token")
+        user_id = uuid.UUID(claims["sub"])
+    except (JWTError, ValueError):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+
+    user = principals.get(db, user_id)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    return TokenResponse(access_token=_access_token(user))
 
 
 @router.get("/me", response_model=UserMeResponse)
-def me(current_user: User = Depends(get_current_user)) -> UserMeResponse:
+def me(current_user: Principal = Depends(get_current_user)) -> UserMeResponse:
     return UserMeResponse(id=current_user.id, username=current_user.username, role=current_user.role)
-
@@ -1,123 +1,101 @@
 from __future__ import annotations
 
-import csv
-import io
+import uuid
+from collections.abc import Iterator
 from datetime import datetime
+from decimal import Decimal
 
-from fastapi import APIRouter, Depends, Query
-from fastapi.responses import Response
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_user
 from app.core.database import get_db
-from app.models.payment import Payment
-from app.models.student import Student
-from app.models.student_balance_view import StudentBalanceView
-from app.models.user import User
+from app.models.enums import ExportJobStatus, StudentStatus
+from app.models.export_job import ExportJob
+from app.schemas.exports import ExportJobCreate, ExportJobRead
+from app.services import export_jobs, exports
+from app.services.exports import ExportFormat
+from app.services.principals import Principal
 
 
 router = APIRouter()
 
 
-def _csv_response(filename: str, rows: list[list[str]]) -> Response:
-    buf = io.StringIO()
-    writer = csv.writer(buf)
-    for row in rows:
-        writer.writerow(row)
-    content = buf.getvalue()
-    return Response(
-        content,
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={filename}"},
+def _export_response(
+    name: str, fmt: ExportFormat, chunks: Iterator[str | bytes]
+) -> StreamingResponse:
+    return StreamingResponse(
+        chunks,
+        media_type=exports.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename={name}.{fmt}"},
     )
 
 
 @router.get("/students.csv")
 def export_students_csv(
-    db: Session = Depends(get_db),
-    _: User = Depends(get_current_user),
-) -> Response:
-    students = db.execute(select(Student).order_by(Student.student_code)).scalars().all()
-    rows = [
-        ["student_code", "name", "class_name", "section", "status", "created_at"],
-        *[
-            [
-                s.student_code,
-                s.name,
-                s.class_name or "",
-                s.section or "",
-                s.status.value,
-                s.created_at.isoformat(),
-            ]
-            for s in students
-        ],
-    ]
-    return _csv_response("students.csv", rows)
+    _: Principal = Depends(get_current_user),
+    fmt: ExportFormat = Query(default="csv", alias="format"),
+) -> StreamingResponse:
+    return _export_response("students", fmt, exports.export("students", fmt))
 
 
 @router.get("/payments.csv")
 def export_payments_csv(
-    db: Session = Depends(get_db),
-    _: User = Depends(get_current_user),
-    student_id: str | None = None,
+    _: Principal = Depends(get_current_user),
+    fmt: ExportFormat = Query(default="csv", alias="format"),
+    student_id: uuid.UUID | None = None,
     from_dt: datetime | None = Query(default=None, alias="from"),
     to_dt: datetime | None = Query(default=None, alias="to"),
-) -> Response:
-    stmt = select(Payment).order_by(Payment.paid_at.desc())
-    if student_id:
-        stmt = stmt.where(Payment.student_id == student_id)
-    if from_dt:
-        stmt = stmt.where(Payment.paid_at >= from_dt)
-    if to_dt:
-        stmt = stmt.where(Payment.paid_at <= to_dt)
-    payments = db.execute(stmt).scalars().all()
-    rows = [
-        [
-            "receipt_no",
-            "student_id",
-            "amount",
-            "mode",
-            "reference_no",
-            "notes",
-            "paid_at",
-            "created_by",
-        ],
-        *[
-            [
-                p.receipt_no,
-                str(p.student_id),
-                str(p.amount),
-                p.mode.value,
-                p.reference_no or "",
-                p.notes or "",
-                p.paid_at.isoformat(),
-                str(p.created_by),
-            ]
-            for p in payments
-        ],
-    ]
-    return _csv_response("payments.csv", rows)
+) -> StreamingResponse:
+    # On Postgres, CSV rows are formatted by COPY ... TO STDOUT instead of in Python.
+    return _export_response(
+        "payments", fmt, exports.export(
+            "payments", fmt, student_id=student_id, from_dt=from_dt, to_dt=to_dt
+        )
+    )
 
 
 @router.get("/pending.csv")
 def export_pending_csv(
+    _: Principal = Depends(get_current_user),
+    fmt: ExportFormat = Query(default="csv", alias="format"),
+    status: StudentStatus | None = None,
+    min_pending: Decimal | None = None,
+) -> StreamingResponse:
+    return _export_response(
+        "pending", fmt, exports.export("pending", fmt, status=status, min_pending=min_pending)
+    )
+
+
+@router.post("/jobs", response_model=ExportJobRead, status_code=202)
+def create_export_job(
+    payload: ExportJobCreate,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+) -> ExportJobRead:
+    job = export_jobs.submit(db, payload, created_by=current_user.id)
+    return ExportJobRead.model_validate(job)
+
+
+@router.get("/jobs/{job_id}", response_model=None)
+def get_export_job(
+    job_id: uuid.UUID,
     db: Session = Depends(get_db),
-    _: User = Depends(get_current_user),
+    _: Principal = Depends(get_current_user),
 ) -> Response:
-    rows_data = db.execute(select(StudentBalanceView).order_by(StudentBalanceView.pending.desc())).scalars().all()
-    rows = [
-        ["student_code", "name", "expected_fee", "paid_total", "pending"],
-        *[
-            [
-                r.student_code,
-                r.name,
-                str(r.expected_fee),
-                str(r.paid_total),
-                str(r.pending),
-            ]
-            for r in rows_data
-            if r.pending != 0
-        ],
-    ]
-    return _csv_response("pending.csv", rows)
+    # Progress as JSON until the file is ready (202 while queued or running), then
+    # the file itself; FileResponse answers Range requests, so downloads resume.
+    job = db.get(ExportJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job.status != ExportJobStatus.done:
+        code = status.HTTP_200_OK if job.status == ExportJobStatus.failed else status.HTTP_202_ACCEPTED
+        return JSONResponse(ExportJobRead.model_validate(job).model_dump(mode="json"), status_code=code)
+
+    path = export_jobs.download_path(job)
+    if path is None:
+        raise HTTPException(status_code=410, detail="Export file has expired")
+    return FileResponse(
+        path, media_type=exports.MEDIA_TYPES[job.format], filename=f"{job.kind}.{job.format}"
+    )
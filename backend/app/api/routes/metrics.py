@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends
+
+from app.api.deps import get_current_user
+from app.services import balance_cache, principals, suggest, summary
+from app.services.principals import Principal
+
+
+router = APIRouter()
+
+
+@router.get("/caches", response_model=dict)
+def cache_stats(_: Principal = Depends(get_current_user)) -> dict:
+    return {
+        "balance": balance_cache.backend.stats(),
+        "summary": summary.stats(),
+        "suggest": suggest.index.stats(),
+        "principals": principals.stats(),
+    }
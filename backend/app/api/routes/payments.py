@@ -1,80 +1,139 @@
 from __future__ import annotations
 
+import base64
+import binascii
 import uuid
 from datetime import UTC, datetime
-from decimal import Decimal
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import func, select
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlalchemy import insert, literal, select, tuple_
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, ledger_etag
 from app.core.database import get_db
 from app.models.enums import PaymentMode
 from app.models.payment import Payment
-from app.models.receipt_sequence import ReceiptSequence
 from app.models.student import Student
-from app.models.user import User
-from app.schemas.payments import PaymentCreate, PaymentRead, PaymentReverseRequest
+from app.schemas.payments import (
+    PaymentBulkCreate,
+    PaymentBulkItemResult,
+    PaymentBulkResult,
+    PaymentCreate,
+    PaymentRead,
+    PaymentReverseRequest,
+)
+from app.services import counts, idempotency
+from app.services.counts import CountStrategy
+from app.services.payments import insert_payment, insert_reversal, record_written
+from app.services.principals import Principal
+from app.services.receipts import get_receipt_allocator
 
 
 router = APIRouter()
 
 
-def _generate_receipt_no(db: Session) -> str:
-    seq = (
-        db.execute(
-            select(ReceiptSequence).where(ReceiptSequence.id == 1).with_for_update()
-        )
-        .scalars()
-        .one_or_none()
-    )
-    if not seq:
-        seq = ReceiptSequence(id=1)
-        db.add(seq)
-        db.flush()
-        db.refresh(seq)
+def _encode_cursor(payment: Payment) -> str:
+    raw = f"{payment.paid_at.isoformat()}|{payment.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
 
-    seq.current_number += 1
-    seq.updated_at = datetime.now(UTC)
-    receipt_no = f"{seq.prefix}{seq.current_number}"
-    return receipt_no
+def _decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        paid_at, payment_id = raw.split("|")
+        return datetime.fromisoformat(paid_at), uuid.UUID(payment_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=422, detail="Invalid cursor")
 
 
 @router.post("", response_model=PaymentRead, status_code=201)
 def create_payment(
     payload: PaymentCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key", max_length=255),
 ) -> PaymentRead:
+    scope = "payments.create"
+    if idempotency_key:
+        replay = idempotency.find_replay(db, idempotency_key, scope)
+        if replay is not None:
+            return replay
+
     if payload.amount == 0:
         raise HTTPException(status_code=422, detail="amount must be non-zero")
 
-    student = db.get(Student, payload.student_id)
-    if not student:
+    payment = insert_payment(db, payload, created_by=current_user.id)
+    if payment is None:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Student not found")
+    payment = idempotency.commit(db, idempotency_key or None, scope, payment)
+    counts.invalidate("payments")
+    return payment
+
 
-    receipt_no = _generate_receipt_no(db)
-    payment = Payment(
-        receipt_no=receipt_no,
-        student_id=payload.student_id,
-        amount=payload.amount,
-        mode=payload.mode,
-        reference_no=payload.reference_no,
-        notes=payload.notes,
-        paid_at=payload.paid_at or datetime.now(UTC),
-        created_by=current_user.id,
+@router.post("/bulk", response_model=PaymentBulkResult)
+def create_payments_bulk(
+    payload: PaymentBulkCreate,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+) -> PaymentBulkResult:
+    student_ids = {item.student_id for item in payload.items}
+    known_ids = set(db.execute(select(Student.id).where(Student.id.in_(student_ids))).scalars())
+
+    results: list[PaymentBulkItemResult] = []
+    accepted: list[tuple[int, PaymentCreate]] = []
+    for index, item in enumerate(payload.items):
+        if item.amount == 0:
+            results.append(
+                PaymentBulkItemResult(index=index, status="rejected", error="amount must be non-zero")
+            )
+        elif item.student_id not in known_ids:
+            results.append(
+                PaymentBulkItemResult(index=index, status="rejected", error="Student not found")
+            )
+        else:
+            accepted.append((index, item))
+
+    if accepted:
+        receipt_nos = get_receipt_allocator().allocate(db, len(accepted))
+        now = datetime.now(UTC)
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "receipt_no": receipt_no,
+                "student_id": item.student_id,
+                "amount": item.amount,
+                "mode": item.mode,
+                "reference_no": item.reference_no,
+                "notes": item.notes,
+                "paid_at": item.paid_at or now,
+                "created_by": current_user.id,
+                "created_at": now,
+            }
+            for (_, item), receipt_no in zip(accepted, receipt_nos)
+        ]
+        db.execute(insert(Payment), rows)
+        payments = [PaymentRead(**row) for row in rows]
+        record_written(db, payments)
+        db.commit()
+        counts.invalidate("payments")
+        results.extend(
+            PaymentBulkItemResult(index=index, status="accepted", payment=payment)
+            for (index, _), payment in zip(accepted, payments)
+        )
+
+    results.sort(key=lambda r: r.index)
+    return PaymentBulkResult(
+        accepted=len(accepted),
+        rejected=len(payload.items) - len(accepted),
+        results=results,
     )
-    db.add(payment)
-    db.commit()
-    db.refresh(payment)
-    return PaymentRead.model_validate(payment)
 
 
-@router.get("", response_model=dict)
+@router.get("", response_model=dict, dependencies=[Depends(ledger_etag)])
 def list_payments(
     db: Session = Depends(get_db),
-    _: User = Depends(get_current_user),
+    _: Principal = Depends(get_current_user),
     student_id: uuid.UUID | None = None,
     mode: PaymentMode | None = None,
     receipt_no: str | None = None,
@@ -82,6 +141,9 @@ def list_payments(
     to_dt: datetime | None = Query(default=None, alias="to"),
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=200),
+    cursor: str | None = None,
+    include_total: bool = True,
+    count_strategy: CountStrategy = "exact",
 ) -> dict:
     stmt = select(Payment)
     if student_id:
@@ -95,17 +157,37 @@ def list_payments(
     if to_dt:
         stmt = stmt.where(Payment.paid_at <= to_dt)
 
-    total = db.execute(select(func.count()).select_from(stmt.subquery())).scalar_one()
-    items = (
-        db.execute(
-            stmt.order_by(Payment.paid_at.desc())
-            .offset((page - 1) * page_size)
-            .limit(page_size)
+    total: int | None = None
+    if include_total:
+        total, count_strategy = counts.count_rows(
+            db,
+            stmt,
+            strategy=count_strategy,
+            tables=("payments",),
+            signature=("payments", student_id, mode, receipt_no, from_dt, to_dt),
         )
-        .scalars()
-        .all()
-    )
-    return {"items": [PaymentRead.model_validate(p) for p in items], "total": total}
+
+    # Keyset mode: seek past the (paid_at, id) of the previous page's last row using
+    # ix_payments_paid_at_id, so every page costs the same regardless of depth.
+    page_stmt = stmt.order_by(Payment.paid_at.desc(), Payment.id.desc())
+    if cursor:
+        after_paid_at, after_id = _decode_cursor(cursor)
+        page_stmt = page_stmt.where(
+            tuple_(Payment.paid_at, Payment.id)
+            < tuple_(literal(after_paid_at, Payment.paid_at.type), literal(after_id, Payment.id.type))
+        )
+    else:
+        page_stmt = page_stmt.offset((page - 1) * page_size)
+
+    rows = db.execute(page_stmt.limit(page_size + 1)).scalars().all()
+    items = rows[:page_size]
+    next_cursor = _encode_cursor(items[-1]) if len(rows) > page_size else None
+    return {
+        "items": [PaymentRead.model_validate(p) for p in items],
+        "total": total,
+        "count_strategy": count_strategy if include_total else None,
+        "next_cursor": next_cursor,
+    }
 
 
 @router.post("/{payment_id}/reverse", response_model=PaymentRead, status_code=201)
@@ -113,36 +195,24 @@ def reverse_payment(
     payment_id: uuid.UUID,
     payload: PaymentReverseRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key", max_length=255),
 ) -> PaymentRead:
-    original = db.get(Payment, payment_id)
-    if not original:
-        raise HTTPException(status_code=404, detail="Payment not found")
+    scope = f"payments.reverse:{payment_id}"
+    if idempotency_key:
+        replay = idempotency.find_replay(db, idempotency_key, scope)
+        if replay is not None:
+            return replay
 
     if payload.amount is not None and payload.amount == 0:
+        if not db.get(Payment, payment_id):
+            raise HTTPException(status_code=404, detail="Payment not found")
         raise HTTPException(status_code=422, detail="amount must be non-zero")
 
-    sign = Decimal("-1") if Decimal(original.amount) > 0 else Decimal("1")
-    reversal_amount = (
-        sign * abs(payload.amount)
-        if payload.amount is not None
-        else Decimal(original.amount) * Decimal("-1")
-    )
-
-    receipt_no = _generate_receipt_no(db)
-    reason_note = f"REVERSAL of {original.receipt_no}: {payload.reason}"
-    notes = reason_note if not original.notes else f"{reason_note} | orig_notes: {original.notes}"
-    reversal = Payment(
-        receipt_no=receipt_no,
-        student_id=original.student_id,
-        amount=reversal_amount,
-        mode=original.mode,
-        reference_no=original.reference_no,
-        notes=notes,
-        paid_at=datetime.now(UTC),
-        created_by=current_user.id,
-    )
-    db.add(reversal)
-    db.commit()
-    db.refresh(reversal)
-    return PaymentRead.model_validate(reversal)
+    reversal = insert_reversal(db, payment_id, payload, created_by=current_user.id)
+    if reversal is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Payment not found")
+    reversal = idempotency.commit(db, idempotency_key or None, scope, reversal)
+    counts.invalidate("payments")
+    return reversal
@@ -1,66 +1,51 @@
 from __future__ import annotations
 
-from datetime import UTC, date, datetime, time
+from datetime import date, datetime
+from decimal import Decimal
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import func, select
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_user
 from app.core.database import get_db
 from app.models.enums import StudentStatus
-from app.models.payment import Payment
-from app.models.student import Student
-from app.models.student_balance_view import StudentBalanceView
-from app.models.user import User
+from app.models.payment_daily_rollup import PaymentDailyRollup
+from app.services import class_rollup, ledger
+from app.services import summary as summary_service
+from app.services import timeseries as timeseries_service
+from app.services.principals import Principal
+from app.services.timeseries import Bucket, GroupBy
 
 
 router = APIRouter()
 
+MAX_TIMESERIES_DAYS = 366 * 5
+
 
 @router.get("/summary", response_model=dict)
 def summary(
     db: Session = Depends(get_db),
-    _: User = Depends(get_current_user),
+    _: Principal = Depends(get_current_user),
     from_dt: datetime | None = Query(default=None, alias="from"),
     to_dt: datetime | None = Query(default=None, alias="to"),
 ) -> dict:
-    stmt = select(func.coalesce(func.sum(Payment.amount), 0))
-    if from_dt:
-        stmt = stmt.where(Payment.paid_at >= from_dt)
-    if to_dt:
-        stmt = stmt.where(Payment.paid_at <= to_dt)
-    total_collected = db.execute(stmt).scalar_one()
-
-    now = datetime.now(UTC)
-    today_start = datetime.combine(now.date(), time.min, tzinfo=UTC)
-    month_start = datetime(now.year, now.month, 1, tzinfo=UTC)
-    today_total = db.execute(
-        select(func.coalesce(func.sum(Payment.amount), 0)).where(Payment.paid_at >= today_start)
-    ).scalar_one()
-    month_total = db.execute(
-        select(func.coalesce(func.sum(Payment.amount), 0)).where(Payment.paid_at >= month_start)
-    ).scalar_one()
-
-    pending_total = db.execute(select(func.coalesce(func.sum(StudentBalanceView.pending), 0))).scalar_one()
-    return {
-        "total_collected": str(total_collected),
-        "today_total": str(today_total),
-        "month_total": str(month_total),
-        "pending_total": str(pending_total),
-    }
+    return summary_service.get_summary(db, from_dt, to_dt)
 
 
 @router.get("/pending", response_model=list[dict])
 def pending(
     db: Session = Depends(get_db),
-    _: User = Depends(get_current_user),
+    _: Principal = Depends(get_current_user),
     status: StudentStatus | None = None,
+    min_pending: Decimal | None = None,
+    page: int = Query(1, ge=1),
+    page_size: int | None = Query(default=None, ge=1, le=1000),
 ) -> list[dict]:
-    stmt = select(StudentBalanceView).join(Student, Student.id == StudentBalanceView.student_id)
-    if status is not None:
-        stmt = stmt.where(Student.status == status)
-    rows = db.execute(stmt.order_by(StudentBalanceView.pending.desc())).scalars().all()
+    stmt = ledger.pending_query(status=status, min_pending=min_pending)
+    if page_size is not None:
+        stmt = stmt.offset((page - 1) * page_size).limit(page_size)
+    rows = db.execute(stmt).all()
     return [
         {
             "student_id": r.student_id,
@@ -71,25 +56,45 @@ def pending(
             "pending": str(r.pending),
         }
         for r in rows
-        if r.pending != 0
     ]
 
 
+@router.get("/by-class", response_model=list[dict])
+def by_class(
+    db: Session = Depends(get_db),
+    _: Principal = Depends(get_current_user),
+    class_name: str | None = None,
+) -> list[dict]:
+    return class_rollup.by_class(db, class_name)
+
+
 @router.get("/daily", response_model=list[dict])
 def daily(
     report_date: date = Query(alias="date"),
     db: Session = Depends(get_db),
-    _: User = Depends(get_current_user),
+    _: Principal = Depends(get_current_user),
 ) -> list[dict]:
-    start = datetime.combine(report_date, time.min, tzinfo=UTC)
-    end = datetime.combine(report_date, time.max, tzinfo=UTC)
-    rows = (
-        db.execute(
-            select(Payment.mode, func.coalesce(func.sum(Payment.amount), 0).label("total"))
-            .where(Payment.paid_at >= start)
-            .where(Payment.paid_at <= end)
-            .group_by(Payment.mode)
-        )
-        .all()
-    )
+    rows = db.execute(
+        select(PaymentDailyRollup.mode, PaymentDailyRollup.total)
+        .where(PaymentDailyRollup.day == report_date)
+        .order_by(PaymentDailyRollup.mode)
+    ).all()
     return [{"mode": mode.value, "total": str(total)} for mode, total in rows]
+
+
+@router.get("/timeseries", response_model=dict)
+def timeseries(
+    from_day: date = Query(alias="from"),
+    to_day: date = Query(alias="to"),
+    bucket: Bucket = "day",
+    group_by: GroupBy | None = None,
+    db: Session = Depends(get_db),
+    _: Principal = Depends(get_current_user),
+) -> dict:
+    if to_day < from_day:
+        raise HTTPException(status_code=422, detail="to must not be before from")
+    if (to_day - from_day).days > MAX_TIMESERIES_DAYS:
+        raise HTTPException(
+            status_code=422, detail=f"range must not exceed {MAX_TIMESERIES_DAYS} days"
+        )
+    return timeseries_service.collect(db, from_day, to_day, bucket, group_by)
@@ -3,80 +3,126 @@ from __future__ import annotations
 import uuid
 from datetime import UTC, datetime
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import func, or_, select
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, ledger_etag
 from app.core.database import get_db
 from app.models.student import Student
-from app.models.student_balance_view import StudentBalanceView
+from app.models.student_balance import StudentBalance
 from app.models.student_fee import StudentFee
-from app.models.user import User
 from app.models.enums import StudentStatus
 from app.schemas.students import (
     StudentCreate,
     StudentListItem,
     StudentBalanceRead,
+    StudentFeeBulkResult,
+    StudentFeeBulkUpdate,
     StudentFeeRead,
     StudentFeeUpdate,
+    StudentImportResult,
+    StudentPromotion,
+    StudentPromotionResult,
     StudentRead,
+    StudentSuggestion,
     StudentUpdate,
 )
+from app.services import (
+    balance_cache,
+    class_rollup,
+    counts,
+    fees,
+    ledger,
+    promotion,
+    student_import,
+    student_search,
+    suggest,
+    watermark,
+)
+from app.services.counts import CountStrategy
+from app.services.principals import Principal
+from app.services.student_import import ImportFormat
 
 
 router = APIRouter()
 
 
-@router.get("", response_model=dict)
+def _student_filters(
+    search: str | None,
+    status: StudentStatus | None,
+    class_name: str | None,
+    section: str | None,
+) -> list:
+    filters = []
+    if search:
+        filters.append(student_search.matches(search))
+    if status is not None:
+        filters.append(Student.status == status)
+    if class_name:
+        filters.append(Student.class_name == class_name)
+    if section:
+        filters.append(Student.section == section)
+    return filters
+
+
+def _student_order(db: Session, search: str | None) -> list:
+    if search:
+        return [student_search.rank(db, search).desc(), Student.student_code]
+    return [Student.student_code]
+
+
+@router.get("", response_model=dict, dependencies=[Depends(ledger_etag)])
 def list_students(
     db: Session = Depends(get_db),
-    _: User = Depends(get_current_user),
+    _: Principal = Depends(get_current_user),
     search: str | None = None,
     status: StudentStatus | None = None,
     class_name: str | None = None,
     section: str | None = None,
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=200),
+    count_strategy: CountStrategy = "exact",
 ) -> dict:
-    stmt = select(Student)
-
-    if search:
-        s = f"%{search.lower()}%"
-        stmt = stmt.where(
-            or_(func.lower(Student.student_code).like(s), func.lower(Student.name).like(s))
-        )
-    if status is not None:
-        stmt = stmt.where(Student.status == status)
-    if class_name:
-        stmt = stmt.where(Student.class_name == class_name)
-    if section:
-        stmt = stmt.where(Student.section == section)
+    filters = _student_filters(search, status, class_name, section)
+    stmt = select(Student).where(*filters)
 
-    total = db.execute(select(func.count()).select_from(stmt.subquery())).scalar_one()
+    total, count_strategy = counts.count_rows(
+        db,
+        stmt,
+        strategy=count_strategy,
+        tables=("students",),
+        signature=("students", search, status, class_name, section),
+    )
     items = (
         db.execute(
-            stmt.order_by(Student.student_code)
+            stmt.order_by(*_student_order(db, search))
             .offset((page - 1) * page_size)
             .limit(page_size)
         )
         .scalars()
         .all()
     )
-    return {"items": [StudentRead.model_validate(s) for s in items], "total": total}
+    return {
+        "items": [StudentRead.model_validate(s) for s in items],
+        "total": total,
+        "count_strategy": count_strategy,
+    }
 
 
-@router.get("/balances", response_model=dict)
+@router.get("/balances", response_model=dict, dependencies=[Depends(ledger_etag)])
 def list_student_balances(
     db: Session = Depends(get_db),
-    _: User = Depends(get_current_user),
+    _: Principal = Depends(get_current_user),
     search: str | None = None,
     status: StudentStatus | None = None,
     class_name: str | None = None,
     section: str | None = None,
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=200),
+    count_strategy: CountStrategy = "exact",
 ) -> dict:
+    filters = _student_filters(search, status, class_name, section)
     stmt = (
         select(
             Student.id,
@@ -85,29 +131,26 @@ def list_student_balances(
             Student.class_name,
             Student.section,
             Student.status,
-            StudentBalanceView.expected_fee,
-            StudentBalanceView.paid_total,
-            StudentBalanceView.pending,
+            StudentBalance.expected_fee,
+            StudentBalance.paid_total,
+            StudentBalance.pending,
         )
-        .join(StudentBalanceView, StudentBalanceView.student_id == Student.id)
+        .join(StudentBalance, StudentBalance.student_id == Student.id)
+        .where(*filters)
     )
 
-    if search:
-        s = f"%{search.lower()}%"
-        stmt = stmt.where(
-            or_(func.lower(Student.student_code).like(s), func.lower(Student.name).like(s))
-        )
-    if status is not None:
-        stmt = stmt.where(Student.status == status)
-    if class_name:
-        stmt = stmt.where(Student.class_name == class_name)
-    if section:
-        stmt = stmt.where(Student.section == section)
-
-    total = db.execute(select(func.count()).select_from(stmt.subquery())).scalar_one()
+    # Every student has exactly one balance row, so counting the same filters over
+    # students alone avoids evaluating the balance aggregation.
+    total, count_strategy = counts.count_rows(
+        db,
+        select(Student.id).where(*filters),
+        strategy=count_strategy,
+        tables=("students",),
+        signature=("students", search, status, class_name, section),
+    )
     rows = (
         db.execute(
-            stmt.order_by(Student.student_code)
+            stmt.order_by(*_student_order(db, search))
             .offset((page - 1) * page_size)
             .limit(page_size)
         )
@@ -127,14 +170,24 @@ def list_student_balances(
         )
         for r in rows
     ]
-    return {"items": items, "total": total}
+    return {"items": items, "total": total, "count_strategy": count_strategy}
+
+
+@router.get("/suggest", response_model=list[StudentSuggestion])
+def suggest_students(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=50),
+    _: Principal = Depends(get_current_user),
+) -> list[StudentSuggestion]:
+    # Served from this worker's in-memory index; no database round trip.
+    return [StudentSuggestion(**item) for item in suggest.index.suggest(q, limit)]
 
 
 @router.post("", response_model=StudentRead, status_code=201)
 def create_student(
     payload: StudentCreate,
     db: Session = Depends(get_db),
-    _: User = Depends(get_current_user),
+    _: Principal = Depends(get_current_user),
 ) -> StudentRead:
     existing = db.execute(select(Student).where(Student.student_code == payload.student_code)).scalar_one_or_none()
     if existing:
@@ -147,17 +200,95 @@ def create_student(
         section=payload.section,
     )
     student.fee = StudentFee(expected_fee_amount=0)
+    student.balance = StudentBalance(expected_fee=0, paid_total=0, pending=0)
     db.add(student)
+    db.flush()
+    class_rollup.add_student(db, student.class_name, student.section)
+    suggest.mark_written(db, [suggest.entry(student)])
+    watermark.bump(db)
     db.commit()
+    counts.invalidate("students")
     db.refresh(student)
     return StudentRead.model_validate(student)
 
 
+@router.post("/import", response_model=StudentImportResult)
+def import_students(
+    file: UploadFile,
+    format: ImportFormat | None = None,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+) -> StudentImportResult:
+    # The upload is spooled to disk by the server and parsed as a stream here.
+    if format is None:
+        name = (file.filename or "").lower()
+        format = "jsonl" if name.endswith((".jsonl", ".ndjson")) else "csv"
+    return student_import.import_students(
+        db, student_import.read_records(file.file, format), updated_by=current_user.id
+    )
+
+
+@router.patch("/fees", response_model=StudentFeeBulkResult)
+def bulk_update_student_fees(
+    payload: StudentFeeBulkUpdate,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+) -> StudentFeeBulkResult:
+    selector = (payload.class_name, payload.section, payload.status)
+    if payload.items is None:
+        if payload.expected_fee_amount is None:
+            raise HTTPException(status_code=422, detail="give expected_fee_amount or items")
+        if all(v is None for v in selector):
+            raise HTTPException(
+                status_code=422, detail="give class_name, section or status to select students"
+            )
+        updated = fees.assign_where(
+            db,
+            payload.expected_fee_amount,
+            updated_by=current_user.id,
+            class_name=payload.class_name,
+            section=payload.section,
+            status=payload.status,
+        )
+        db.commit()
+        return StudentFeeBulkResult(updated=updated)
+
+    if payload.expected_fee_amount is not None or any(v is not None for v in selector):
+        raise HTTPException(
+            status_code=422, detail="items cannot be combined with an amount or selector"
+        )
+    amounts = {item.student_id: item.expected_fee_amount for item in payload.items}
+    if len(amounts) != len(payload.items):
+        raise HTTPException(status_code=422, detail="items repeat a student_id")
+    known = set(db.execute(select(Student.id).where(Student.id.in_(list(amounts)))).scalars())
+    missing = [str(student_id) for student_id in amounts if student_id not in known]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Students not found: {', '.join(missing[:20])}")
+
+    fees.assign(db, amounts, updated_by=current_user.id)
+    db.commit()
+    return StudentFeeBulkResult(updated=len(amounts))
+
+
+@router.post("/promote", response_model=StudentPromotionResult)
+def promote_students(
+    payload: StudentPromotion,
+    db: Session = Depends(get_db),
+    _: Principal = Depends(get_current_user),
+) -> StudentPromotionResult:
+    # Counts are active students per old class_name in the mapping.
+    if payload.dry_run:
+        return StudentPromotionResult(dry_run=True, counts=promotion.plan(db, payload.mapping))
+    done = promotion.promote(db, payload.mapping)
+    db.commit()
+    return StudentPromotionResult(dry_run=False, counts=done)
+
+
 @router.get("/{student_id}", response_model=StudentRead)
 def get_student(
     student_id: uuid.UUID,
     db: Session = Depends(get_db),
-    _: User = Depends(get_current_user),
+    _: Principal = Depends(get_current_user),
 ) -> StudentRead:
     student = db.get(Student, student_id)
     if not student:
@@ -169,18 +300,30 @@ def get_student(
 def get_student_balance(
     student_id: uuid.UUID,
     db: Session = Depends(get_db),
-    _: User = Depends(get_current_user),
+    _: Principal = Depends(get_current_user),
 ) -> StudentBalanceRead:
-    row = (
-        db.execute(
-            select(StudentBalanceView).where(StudentBalanceView.student_id == student_id)
+    cached = balance_cache.get(student_id)
+    if cached is not None:
+        return cached
+    generation = balance_cache.generation()
+
+    row = db.execute(
+        select(
+            StudentBalance.student_id,
+            Student.student_code,
+            Student.name,
+            StudentBalance.expected_fee,
+            StudentBalance.paid_total,
+            StudentBalance.pending,
         )
-        .scalars()
-        .one_or_none()
-    )
+        .join(Student, Student.id == StudentBalance.student_id)
+        .where(StudentBalance.student_id == student_id)
+    ).one_or_none()
     if not row:
         raise HTTPException(status_code=404, detail="Student not found")
-    return StudentBalanceRead.model_validate(row)
+    balance = StudentBalanceRead.model_validate(row)
+    balance_cache.put(balance, generation)
+    return balance
 
 
 @router.patch("/{student_id}", response_model=StudentRead)
@@ -188,17 +331,27 @@ def update_student(
     student_id: uuid.UUID,
     payload: StudentUpdate,
     db: Session = Depends(get_db),
-    _: User = Depends(get_current_user),
+    _: Principal = Depends(get_current_user),
 ) -> StudentRead:
     student = db.get(Student, student_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
+    old_group = class_rollup.group_of(student.class_name, student.section)
     data = payload.model_dump(exclude_unset=True)
     for key, value in data.items():
         setattr(student, key, value)
+    # Row lock on the student before its balance, the order bulk promotion uses.
+    db.flush()
+    class_rollup.move_student(
+        db, student_id, old_group, class_rollup.group_of(student.class_name, student.section)
+    )
+    balance_cache.mark_changed(db, [student_id])
+    suggest.mark_written(db, [suggest.entry(student)])
+    watermark.bump(db)
 
     db.commit()
+    counts.invalidate("students")
     db.refresh(student)
     return StudentRead.model_validate(student)
 
@@ -208,7 +361,7 @@ def update_student_fee(
     student_id: uuid.UUID,
     payload: StudentFeeUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ) -> StudentFeeRead:
     student = db.get(Student, student_id)
     if not student:
@@ -222,6 +375,7 @@ def update_student_fee(
     fee.expected_fee_amount = payload.expected_fee_amount
     fee.last_fee_updated_at = datetime.now(UTC)
     fee.last_fee_updated_by = current_user.id
+    ledger.set_expected_fee(db, student_id, payload.expected_fee_amount)
 
     db.commit()
     db.refresh(fee)
@@ -232,7 +386,7 @@ def update_student_fee(
 def get_student_fee(
     student_id: uuid.UUID,
     db: Session = Depends(get_db),
-    _: User = Depends(get_current_user),
+    _: Principal = Depends(get_current_user),
 ) -> StudentFeeRead:
     fee = db.get(StudentFee, student_id)
     if not fee:
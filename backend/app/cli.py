@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import argparse
+
+from app.core.database import SessionLocal
+from app.services import class_rollup, export_jobs, idempotency, ledger, rollups
+
+
+def purge_idempotency_keys(_: argparse.Namespace) -> None:
+    with SessionLocal() as db:
+        removed = idempotency.purge_expired(db)
+    print(f"removed {removed} expired idempotency keys")
+
+
+def purge_export_jobs(_: argparse.Namespace) -> None:
+    with SessionLocal() as db:
+        removed = export_jobs.purge_expired(db)
+    print(f"removed {removed} expired export jobs")
+
+
+def rebuild_balances(args: argparse.Namespace) -> None:
+    with SessionLocal() as db:
+        if args.verify:
+            drift = ledger.find_drift(db)
+            for row in drift:
+                print(
+                    f"{row.student_id}: stored paid_total={row.stored_paid_total} "
+                    f"pending={row.stored_pending}, computed paid_total={row.paid_total} "
+                    f"pending={row.pending}"
+                )
+            print(f"{len(drift)} student balances drifted")
+            raise SystemExit(1 if drift else 0)
+        repaired = ledger.rebuild(db)
+    print(f"repaired {repaired} student balances")
+
+
+def backfill_daily_rollup(_: argparse.Namespace) -> None:
+    with SessionLocal() as db:
+        rows = rollups.backfill(db)
+    print(f"rebuilt {rows} daily rollup rows")
+
+
+def backfill_class_rollup(_: argparse.Namespace) -> None:
+    with SessionLocal() as db:
+        rows = class_rollup.backfill(db)
+    print(f"rebuilt {rows} class/section rollup rows")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser(
+        "purge-idempotency-keys", help="delete idempotency keys past their TTL"
+    ).set_defaults(func=purge_idempotency_keys)
+
+    commands.add_parser(
+        "purge-export-jobs", help="delete export jobs and files past their retention"
+    ).set_defaults(func=purge_export_jobs)
+
+    rebuild = commands.add_parser(
+        "rebuild-balances", help="recompute student_balance from payments and fees"
+    )
+    rebuild.add_argument(
+        "--verify", action="store_true", help="only report drift; exit 1 if any is found"
+    )
+    rebuild.set_defaults(func=rebuild_balances)
+
+    commands.add_parser(
+        "backfill-daily-rollup", help="rebuild payment_daily_rollup from payments"
+    ).set_defaults(func=backfill_daily_rollup)
+
+    commands.add_parser(
+        "backfill-class-rollup", help="rebuild class_section_rollup from student_balance"
+    ).set_defaults(func=backfill_class_rollup)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
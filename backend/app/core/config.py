@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -12,9 +14,40 @@ class Settings(BaseSettings):
 
     cors_origins: list[str] = ["http://localhost:3000"]
     receipt_prefix: str = "FEE-"
+    receipt_allocator: Literal["row_lock", "sequence", "block"] = "row_lock"
+    receipt_block_size: int = 100
+
+    idempotency_ttl_hours: int = 24
+    idempotency_cache_size: int = 10_000
+
+    count_cache_ttl_seconds: float = 30.0
+    count_cache_size: int = 1024
+
+    balance_cache_ttl_seconds: float = 60.0
+    balance_cache_size: int = 10_000
+
+    summary_cache_ttl_seconds: float = 5.0
+
+    suggest_refresh_seconds: float = 30.0
+
+    export_spool_dir: str = "/tmp/billing-exports"
+    export_workers: int = 2
+    export_max_pending: int = 8
+    export_retention_hours: int = 24
 
     jwt_algorithm: str = "HS256"
     jwt_access_token_exp_minutes: int = 60 * 24
+    jwt_refresh_token_exp_days: int = 7
+    # Take username/role from the token instead of looking the user up. Role changes
+    # and deletions then apply only once existing tokens expire.
+    jwt_trust_claims: bool = False
+
+    auth_cache_ttl_seconds: float = 60.0
+    auth_cache_size: int = 1024
+
+    # None starts one password hashing process per core.
+    password_hash_workers: int | None = None
+    password_hash_max_pending: int = 32
 
 
 settings = Settings()  # type: ignore[call-arg]
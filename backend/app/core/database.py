@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-from collections.abc import Generator
+from collections.abc import Callable, Generator, Hashable
+from typing import TypeVar
 
-from sqlalchemy import create_engine
+from sqlalchemy import Table, create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.pool import StaticPool
 
@@ -29,3 +31,37 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+def upsert_insert(db: Session, table: Table):
+    # INSERT construct with on_conflict_do_update() for the session's dialect.
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+_AFTER_COMMIT_KEY = "after_commit_callbacks"
+C = TypeVar("C", bound=Callable[[], None])
+
+
+def run_after_commit(db: Session, key: Hashable, callback: C) -> C:
+    # Runs callback once the session's current transaction commits; dropped on
+    # rollback. Registering the same key again in a transaction keeps the first
+    # callback and returns it, so callers can collect state on it as they go.
+    return db.info.setdefault(_AFTER_COMMIT_KEY, {}).setdefault(key, callback)
+
+
+def after_commit_callback(db: Session, key: Hashable) -> Callable[[], None] | None:
+    # The callback registered for key in the current transaction, if any.
+    return db.info.get(_AFTER_COMMIT_KEY, {}).get(key)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit_callbacks(session: Session) -> None:
+    for callback in session.info.pop(_AFTER_COMMIT_KEY, {}).values():
+        callback()
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_commit_callbacks(session: Session) -> None:
+    session.info.pop(_AFTER_COMMIT_KEY, None)
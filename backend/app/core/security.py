@@ -19,9 +19,18 @@ def verify_password(password: str, password_hash: str) -> bool:
     return pwd_context.verify(password, password_hash)
 
 
-def create_access_token(*, subject: str) -> str:
-    expires_delta = timedelta(minutes=settings.jwt_access_token_exp_minutes)
+def _encode(subject: str, expires_delta: timedelta, claims: dict[str, str]) -> str:
     expire = datetime.now(UTC) + expires_delta
-    to_encode = {"sub": subject, "exp": expire}
+    to_encode = {**claims, "sub": subject, "exp": expire}
     return jwt.encode(to_encode, settings.jwt_secret, algorithm=settings.jwt_algorithm)
 
+
+def create_access_token(*, subject: str, claims: dict[str, str] | None = None) -> str:
+    expires_delta = timedelta(minutes=settings.jwt_access_token_exp_minutes)
+    return _encode(subject, expires_delta, claims or {})
+
+
+def create_refresh_token(*, subject: str) -> str:
+    # Only good at /api/auth/refresh; get_current_user rejects the "refresh" type.
+    expires_delta = timedelta(days=settings.jwt_refresh_token_exp_days)
+    return _encode(subject, expires_delta, {"typ": "refresh"})
@@ -1,12 +1,24 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.router import api_router
 from app.core.config import settings
+from app.services import balance_cache, passwords, suggest
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    balance_cache.start_listener()
+    suggest.start()
+    yield
+    passwords.shutdown()
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="Fee Collection", version="0.1.0")
+    app = FastAPI(title="Fee Collection", version="0.1.0", lifespan=lifespan)
 
     app.add_middleware(
         CORSMiddleware,
@@ -1,7 +1,12 @@
 from app.models.base import Base
+from app.models.class_section_rollup import ClassSectionRollup
+from app.models.export_job import ExportJob
+from app.models.idempotency_key import IdempotencyKey
 from app.models.payment import Payment
+from app.models.payment_daily_rollup import PaymentDailyRollup
 from app.models.receipt_sequence import ReceiptSequence
 from app.models.student import Student
+from app.models.student_balance import StudentBalance
 from app.models.student_balance_view import StudentBalanceView
 from app.models.student_fee import StudentFee
 from app.models.user import User
@@ -13,6 +18,11 @@ __all__ = [
     "StudentFee",
     "ReceiptSequence",
     "Payment",
+    "StudentBalance",
     "StudentBalanceView",
+    "IdempotencyKey",
+    "PaymentDailyRollup",
+    "ClassSectionRollup",
+    "ExportJob",
 ]
 
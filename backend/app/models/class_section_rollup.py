@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from sqlalchemy import BigInteger, Numeric, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class ClassSectionRollup(Base):
+    __tablename__ = "class_section_rollup"
+
+    # Students without a class or section are grouped under "" (primary keys can't be NULL).
+    class_name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    section: Mapped[str] = mapped_column(String(50), primary_key=True)
+    student_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    expected_fee: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    paid_total: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=0)
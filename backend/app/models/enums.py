@@ -17,3 +17,9 @@ class PaymentMode(str, enum.Enum):
     upi = "upi"
     bank = "bank"
 
+
+class ExportJobStatus(str, enum.Enum):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
@@ -31,3 +31,7 @@ class Payment(Base, UUIDPrimaryKeyMixin, TimestampMixin):
     created_by: Mapped[uuid.UUID] = mapped_column(Uuid(as_uuid=True), ForeignKey("users.id"), nullable=False)
 
     student: Mapped["Student"] = relationship(back_populates="payments")
+
+
+# Matches migration 0004: descending, for newest-first keyset pagination.
+Index("ix_payments_paid_at_id", Payment.paid_at.desc(), Payment.id.desc())
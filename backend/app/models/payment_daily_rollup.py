@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import BigInteger, Date, Enum, Numeric
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+from app.models.enums import PaymentMode
+
+
+class PaymentDailyRollup(Base):
+    __tablename__ = "payment_daily_rollup"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    mode: Mapped[PaymentMode] = mapped_column(Enum(PaymentMode, name="payment_mode"), primary_key=True)
+    total: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
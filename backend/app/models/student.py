@@ -30,5 +30,8 @@ class Student(Base, UUIDPrimaryKeyMixin, TimestampMixin):
     fee: Mapped["StudentFee"] = relationship(
         back_populates="student", cascade="all, delete-orphan", uselist=False
     )
+    balance: Mapped["StudentBalance"] = relationship(
+        back_populates="student", cascade="all, delete-orphan", uselist=False
+    )
     payments: Mapped[list["Payment"]] = relationship(back_populates="student")
 
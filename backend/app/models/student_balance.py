@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import uuid
+from datetime import UTC, datetime
+from decimal import Decimal
+
+from sqlalchemy import DateTime, ForeignKey, Index, Numeric, Uuid, text
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from app.models.base import Base
+
+
+class StudentBalance(Base):
+    __tablename__ = "student_balance"
+    student_id: Mapped[uuid.UUID] = mapped_column(
+        Uuid(as_uuid=True),
+        ForeignKey("students.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    expected_fee: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False, default=0)
+    paid_total: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False, default=0)
+    pending: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(UTC),
+        onupdate=lambda: datetime.now(UTC),
+        nullable=False,
+    )
+
+    student: Mapped["Student"] = relationship(back_populates="balance")
+
+
+# Matches migration 0006: partial, descending, for the largest-pending-first report.
+Index(
+    "ix_student_balance_pending",
+    StudentBalance.pending.desc(),
+    postgresql_where=text("pending <> 0"),
+    sqlite_where=text("pending <> 0"),
+)
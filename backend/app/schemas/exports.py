@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from pydantic import BaseModel, Field
+
+from app.models.enums import ExportJobStatus, StudentStatus
+from app.services.exports import ExportFormat, ExportKind
+
+
+class ExportJobCreate(BaseModel):
+    kind: ExportKind
+    format: ExportFormat = "csv"
+    # Filters, as on the matching /api/export endpoint; ones the kind doesn't take are ignored.
+    student_id: uuid.UUID | None = None
+    from_dt: datetime | None = Field(default=None, alias="from")
+    to_dt: datetime | None = Field(default=None, alias="to")
+    status: StudentStatus | None = None
+    min_pending: Decimal | None = None
+
+    class Config:
+        populate_by_name = True
+
+
+class ExportJobRead(BaseModel):
+    id: uuid.UUID
+    kind: str
+    format: str
+    params: dict
+    status: ExportJobStatus
+    rows_total: int | None
+    rows_done: int
+    bytes_written: int
+    error: str | None
+    created_at: datetime
+    finished_at: datetime | None
+    expires_at: datetime | None
+
+    class Config:
+        from_attributes = True
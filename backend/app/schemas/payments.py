@@ -3,6 +3,7 @@ from __future__ import annotations
 import uuid
 from datetime import datetime
 from decimal import Decimal
+from typing import Literal
 
 from pydantic import BaseModel, Field
 
@@ -38,3 +39,19 @@ class PaymentReverseRequest(BaseModel):
     reason: str = Field(min_length=1, max_length=300)
     amount: Decimal | None = None
 
+
+class PaymentBulkCreate(BaseModel):
+    items: list[PaymentCreate] = Field(min_length=1, max_length=5000)
+
+
+class PaymentBulkItemResult(BaseModel):
+    index: int
+    status: Literal["accepted", "rejected"]
+    payment: PaymentRead | None = None
+    error: str | None = None
+
+
+class PaymentBulkResult(BaseModel):
+    accepted: int
+    rejected: int
+    results: list[PaymentBulkItemResult]
@@ -37,6 +37,15 @@ class StudentRead(BaseModel):
         from_attributes = True
 
 
+class StudentSuggestion(BaseModel):
+    id: uuid.UUID
+    student_code: str
+    name: str
+    class_name: str | None
+    section: str | None
+    status: StudentStatus
+
+
 class StudentFeeRead(BaseModel):
     student_id: uuid.UUID
     expected_fee_amount: Decimal
@@ -66,6 +75,35 @@ class StudentFeeUpdate(BaseModel):
     expected_fee_amount: Decimal = Field(ge=0)
 
 
+class StudentFeeItem(BaseModel):
+    student_id: uuid.UUID
+    expected_fee_amount: Decimal = Field(ge=0)
+
+
+class StudentFeeBulkUpdate(BaseModel):
+    # Either one amount for every student matching the selector, or explicit items.
+    expected_fee_amount: Decimal | None = Field(default=None, ge=0)
+    class_name: str | None = None
+    section: str | None = None
+    status: StudentStatus | None = None
+    items: list[StudentFeeItem] | None = Field(default=None, min_length=1, max_length=50_000)
+
+
+class StudentFeeBulkResult(BaseModel):
+    updated: int
+
+
+class StudentPromotion(BaseModel):
+    # Old class_name -> new class_name; null marks that class's students inactive.
+    mapping: dict[str, str | None] = Field(min_length=1)
+    dry_run: bool = False
+
+
+class StudentPromotionResult(BaseModel):
+    dry_run: bool
+    counts: dict[str, int]
+
+
 class StudentBalanceRead(BaseModel):
     student_id: uuid.UUID
     student_code: str
@@ -76,3 +114,23 @@ class StudentBalanceRead(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class StudentImportRow(StudentCreate):
+    # Left out (or blank), status and fee keep their current values on existing students.
+    status: StudentStatus | None = None
+    expected_fee_amount: Decimal | None = Field(default=None, ge=0)
+
+
+class StudentImportError(BaseModel):
+    line: int
+    student_code: str | None = None
+    error: str
+
+
+class StudentImportResult(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    errors: list[StudentImportError]
+    errors_truncated: bool = False
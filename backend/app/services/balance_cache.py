@@ -0,0 +1,161 @@
+"""Per-student balance cache.
+
+Writers mark the students whose balance changed on their session; the entries are
+evicted locally once the transaction commits. On Postgres the same ids are sent with
+pg_notify inside the transaction, and every worker's listener thread evicts them
+too, so a payment taken on one uvicorn worker is visible on all of them. Entries
+also expire after BALANCE_CACHE_TTL_SECONDS as a backstop for missed notifications.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+
+import psycopg
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import after_commit_callback, engine, run_after_commit
+from app.schemas.students import StudentBalanceRead
+
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "balance_invalidate"
+_SESSION_KEY = "balance_cache_changed"
+# pg_notify payloads are capped at 8000 bytes; past this many ids, flush everything.
+_MAX_NOTIFY_IDS = 200
+
+
+class BalanceCacheBackend(ABC):
+    @abstractmethod
+    def get(self, student_id: uuid.UUID) -> StudentBalanceRead | None: ...
+
+    @abstractmethod
+    def set(self, student_id: uuid.UUID, balance: StudentBalanceRead) -> None: ...
+
+    @abstractmethod
+    def delete(self, student_id: uuid.UUID) -> None: ...
+
+    @abstractmethod
+    def clear(self) -> None: ...
+
+    @abstractmethod
+    def stats(self) -> dict[str, int]: ...
+
+
+class LocalBalanceCache(BalanceCacheBackend):
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self._cache: TTLCache[uuid.UUID, StudentBalanceRead] = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, student_id: uuid.UUID) -> StudentBalanceRead | None:
+        return self._cache.get(student_id)
+
+    def set(self, student_id: uuid.UUID, balance: StudentBalanceRead) -> None:
+        self._cache.set(student_id, balance)
+
+    def delete(self, student_id: uuid.UUID) -> None:
+        self._cache.pop(student_id)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict[str, int]:
+        return self._cache.stats()
+
+
+backend: BalanceCacheBackend = LocalBalanceCache(
+    maxsize=settings.balance_cache_size, ttl=settings.balance_cache_ttl_seconds
+)
+
+
+def set_backend(new_backend: BalanceCacheBackend) -> None:
+    global backend
+    backend = new_backend
+
+
+def get(student_id: uuid.UUID) -> StudentBalanceRead | None:
+    return backend.get(student_id)
+
+
+# Bumped by every eviction. A reader takes it before loading a balance and put()
+# skips the entry if it moved, so a balance read before a write committed is not
+# cached after that write's eviction.
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def generation() -> int:
+    return _generation
+
+
+def put(balance: StudentBalanceRead, generation: int) -> None:
+    with _generation_lock:
+        if generation == _generation:
+            backend.set(balance.student_id, balance)
+
+
+class _Changed(set):
+    # Students whose balance a transaction changed; evicted once it commits.
+    def __call__(self) -> None:
+        _evict(self)
+
+
+def mark_changed(db: Session, student_ids: Iterable[uuid.UUID]) -> None:
+    run_after_commit(db, _SESSION_KEY, _Changed()).update(student_ids)
+
+
+def _evict(student_ids: set[uuid.UUID] | None) -> None:
+    global _generation
+    with _generation_lock:
+        _generation += 1
+        if student_ids is None:
+            backend.clear()
+            return
+        for student_id in student_ids:
+            backend.delete(student_id)
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_other_workers(session: Session) -> None:
+    changed = after_commit_callback(session, _SESSION_KEY)
+    if not changed or session.get_bind().dialect.name != "postgresql":
+        return
+    payload = "*" if len(changed) > _MAX_NOTIFY_IDS else ",".join(str(s) for s in changed)
+    session.execute(select(func.pg_notify(CHANNEL, payload)))
+
+
+def _listen_forever() -> None:
+    conninfo = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+    while True:
+        try:
+            with psycopg.connect(conninfo, autocommit=True) as conn:
+                conn.execute(f"LISTEN {CHANNEL}")
+                # Anything published while we were disconnected is lost.
+                backend.clear()
+                for notify in conn.notifies():
+                    if notify.payload == "*":
+                        _evict(None)
+                    else:
+                        _evict({uuid.UUID(s) for s in notify.payload.split(",")})
+        except Exception:
+            logger.exception("balance cache listener disconnected; retrying")
+            time.sleep(5)
+
+
+_listener: threading.Thread | None = None
+
+
+def start_listener() -> None:
+    global _listener
+    if engine.dialect.name != "postgresql" or _listener is not None:
+        return
+    _listener = threading.Thread(target=_listen_forever, name="balance-cache-listener", daemon=True)
+    _listener.start()
@@ -0,0 +1,179 @@
+"""Keeps class_section_rollup in step with student_balance, one delta per write."""
+
+from __future__ import annotations
+
+import uuid
+from collections import defaultdict
+from collections.abc import Iterable, Mapping
+from decimal import Decimal
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.core.database import upsert_insert
+from app.models.class_section_rollup import ClassSectionRollup
+from app.models.student import Student
+from app.models.student_balance import StudentBalance
+from app.services import watermark
+
+
+Group = tuple[str, str]
+
+
+def group_of(class_name: str | None, section: str | None) -> Group:
+    return (class_name or "", section or "")
+
+
+def _apply(db: Session, deltas: Mapping[Group, tuple[int, Decimal, Decimal]]) -> None:
+    if not deltas:
+        return
+    table = ClassSectionRollup.__table__
+    stmt = upsert_insert(db, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.class_name, table.c.section],
+        set_={
+            "student_count": table.c.student_count + stmt.excluded.student_count,
+            "expected_fee": table.c.expected_fee + stmt.excluded.expected_fee,
+            "paid_total": table.c.paid_total + stmt.excluded.paid_total,
+        },
+    )
+    db.execute(
+        stmt,
+        [
+            {
+                "class_name": class_name,
+                "section": section,
+                "student_count": count,
+                "expected_fee": expected,
+                "paid_total": paid,
+            }
+            for (class_name, section), (count, expected, paid) in sorted(deltas.items())
+        ],
+    )
+
+
+def _groups(db: Session, student_ids) -> dict[uuid.UUID, Group]:
+    rows = db.execute(
+        select(Student.id, Student.class_name, Student.section).where(Student.id.in_(student_ids))
+    ).all()
+    return {r.id: group_of(r.class_name, r.section) for r in rows}
+
+
+def apply_balance_deltas(
+    db: Session,
+    *,
+    paid: Mapping[uuid.UUID, Decimal] | None = None,
+    expected: Mapping[uuid.UUID, Decimal] | None = None,
+) -> None:
+    # Call after the student_balance rows are updated: their row locks keep a
+    # concurrent move_student from reading the class before this delta lands.
+    paid = paid or {}
+    expected = expected or {}
+    groups = _groups(db, set(paid) | set(expected))
+    deltas: defaultdict[Group, list] = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+    for student_id, amount in expected.items():
+        deltas[groups[student_id]][1] += amount
+    for student_id, amount in paid.items():
+        deltas[groups[student_id]][2] += amount
+    _apply(db, {group: tuple(delta) for group, delta in deltas.items()})
+
+
+def apply_group_deltas(db: Session, *, expected: Mapping[Group, Decimal]) -> None:
+    # Expected fee deltas already summed per group, for set-based fee updates.
+    _apply(db, {group: (0, amount, Decimal(0)) for group, amount in expected.items() if amount})
+
+
+def add_student(
+    db: Session,
+    class_name: str | None,
+    section: str | None,
+    expected_fee: Decimal = Decimal(0),
+    paid_total: Decimal = Decimal(0),
+) -> None:
+    _apply(db, {group_of(class_name, section): (1, expected_fee, paid_total)})
+
+
+def add_students(db: Session, students: Iterable[tuple[Group, Decimal]]) -> None:
+    # New students as (group, expected_fee); nothing is paid yet.
+    deltas: defaultdict[Group, list] = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+    for group, expected_fee in students:
+        deltas[group][0] += 1
+        deltas[group][1] += expected_fee
+    _apply(db, {group: tuple(delta) for group, delta in deltas.items()})
+
+
+def move_students(
+    db: Session, moves: Iterable[tuple[Group, Group, Decimal, Decimal]]
+) -> None:
+    # (old group, new group, expected_fee, paid_total) per student, with the balance
+    # read under a row lock so concurrent payments land on one side or the other.
+    deltas: defaultdict[Group, list] = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+    for old, new, expected_fee, paid_total in moves:
+        if old == new:
+            continue
+        for group, sign in ((old, -1), (new, 1)):
+            deltas[group][0] += sign
+            deltas[group][1] += sign * expected_fee
+            deltas[group][2] += sign * paid_total
+    _apply(db, {group: tuple(delta) for group, delta in deltas.items()})
+
+
+def move_student(db: Session, student_id: uuid.UUID, old: Group, new: Group) -> None:
+    if old == new:
+        return
+    balance = db.execute(
+        select(StudentBalance.expected_fee, StudentBalance.paid_total)
+        .where(StudentBalance.student_id == student_id)
+        .with_for_update()
+    ).one()
+    move_students(db, [(old, new, balance.expected_fee, balance.paid_total)])
+
+
+def recompute(db: Session) -> int:
+    class_name = func.coalesce(Student.class_name, "")
+    section = func.coalesce(Student.section, "")
+    db.execute(delete(ClassSectionRollup))
+    return db.execute(
+        insert(ClassSectionRollup).from_select(
+            ["class_name", "section", "student_count", "expected_fee", "paid_total"],
+            select(
+                class_name,
+                section,
+                func.count(),
+                func.sum(StudentBalance.expected_fee),
+                func.sum(StudentBalance.paid_total),
+            )
+            .join(StudentBalance, StudentBalance.student_id == Student.id)
+            .group_by(class_name, section),
+        )
+    ).rowcount
+
+
+def backfill(db: Session) -> int:
+    if db.get_bind().dialect.name == "postgresql":
+        # Balance and student writers update the rollup too; keep them out meanwhile.
+        db.execute(text("LOCK TABLE students, student_balance IN SHARE MODE"))
+    rows = recompute(db)
+    watermark.bump(db)
+    db.commit()
+    return rows
+
+
+def by_class(db: Session, class_name: str | None = None) -> list[dict]:
+    stmt = select(ClassSectionRollup).where(ClassSectionRollup.student_count > 0)
+    if class_name is not None:
+        stmt = stmt.where(ClassSectionRollup.class_name == class_name)
+    rows = db.execute(
+        stmt.order_by(ClassSectionRollup.class_name, ClassSectionRollup.section)
+    ).scalars()
+    return [
+        {
+            "class_name": r.class_name or None,
+            "section": r.section or None,
+            "student_count": r.student_count,
+            "expected_fee": str(r.expected_fee),
+            "paid_total": str(r.paid_total),
+            "pending": str(r.expected_fee - r.paid_total),
+        }
+        for r in rows
+    ]
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+from collections.abc import Hashable
+from typing import Literal
+
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+
+CountStrategy = Literal["exact", "estimated", "cached"]
+
+# Cached counts are per process: TTL bounds how stale another worker's writes can
+# leave them, while writes in this process invalidate immediately.
+_cache: TTLCache[Hashable, int] = TTLCache(
+    maxsize=settings.count_cache_size, ttl=settings.count_cache_ttl_seconds
+)
+_generations: defaultdict[str, int] = defaultdict(int)
+_generations_lock = threading.Lock()
+
+
+class _Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement: Select) -> None:
+        self.statement = statement
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element: _Explain, compiler, **kw) -> str:
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def invalidate(*tables: str) -> None:
+    # Bumping a table's generation orphans every cached count that read from it;
+    # the orphans age out of the LRU.
+    with _generations_lock:
+        for table in tables:
+            _generations[table] += 1
+
+
+def _exact(db: Session, stmt: Select) -> int:
+    return db.execute(select(func.count()).select_from(stmt.subquery())).scalar_one()
+
+
+def _estimate(db: Session, stmt: Select) -> int | None:
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    plan = db.execute(_Explain(stmt)).scalar_one()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_rows(
+    db: Session,
+    stmt: Select,
+    *,
+    strategy: CountStrategy,
+    tables: tuple[str, ...],
+    signature: Hashable,
+) -> tuple[int, CountStrategy]:
+    if strategy == "estimated":
+        estimate = _estimate(db, stmt)
+        if estimate is not None:
+            return estimate, "estimated"
+        return _exact(db, stmt), "exact"
+
+    if strategy == "cached":
+        key = (signature, tuple(_generations[t] for t in tables))
+        total = _cache.get(key)
+        if total is None:
+            total = _exact(db, stmt)
+            _cache.set(key, total)
+        return total, "cached"
+
+    return _exact(db, stmt), "exact"
@@ -0,0 +1,156 @@
+"""Background exports: rendered by a bounded thread pool into EXPORT_SPOOL_DIR.
+
+Job state lives in export_jobs so any worker can report progress; the files are on
+local disk, so workers that serve downloads must share the spool directory.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+from fastapi import HTTPException, status
+from pydantic import TypeAdapter
+from sqlalchemy import delete, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.enums import ExportJobStatus
+from app.models.export_job import ExportJob
+from app.schemas.exports import ExportJobCreate
+from app.services import exports
+
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=settings.export_workers, thread_name_prefix="export")
+# Queued plus running jobs in this process; past this, new jobs are refused.
+_slots = threading.BoundedSemaphore(settings.export_max_pending)
+_PROGRESS_INTERVAL_SECONDS = 1.0
+
+
+def spool_path(job: ExportJob) -> Path:
+    return Path(settings.export_spool_dir) / f"{job.id}.{job.format}"
+
+
+def download_path(job: ExportJob) -> Path | None:
+    # None once the retention period has passed or the file has been purged.
+    expires_at = job.expires_at
+    if expires_at is not None and expires_at.tzinfo is None:
+        # SQLite hands back naive datetimes; they are stored as UTC.
+        expires_at = expires_at.replace(tzinfo=UTC)
+    path = spool_path(job)
+    if (expires_at is not None and expires_at <= datetime.now(UTC)) or not path.exists():
+        return None
+    return path
+
+
+def _filters(job: ExportJob) -> dict:
+    # params hold JSON; revalidate them into the types the queries expect.
+    fields = ExportJobCreate.model_fields
+    return {
+        name: TypeAdapter(fields[name].annotation).validate_python(value)
+        for name, value in job.params.items()
+    }
+
+
+def submit(db: Session, payload: ExportJobCreate, *, created_by: uuid.UUID) -> ExportJob:
+    if not _slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many export jobs in progress; retry later",
+            headers={"Retry-After": "30"},
+        )
+    try:
+        params = payload.model_dump(mode="json", include=set(exports.FILTERS[payload.kind]))
+        job = ExportJob(
+            kind=payload.kind,
+            format=payload.format,
+            params={name: value for name, value in params.items() if value is not None},
+            created_by=created_by,
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        _executor.submit(_run, job.id)
+    except BaseException:
+        _slots.release()
+        raise
+    return job
+
+
+def _run(job_id: uuid.UUID) -> None:
+    try:
+        with SessionLocal() as db:
+            job = db.get(ExportJob, job_id)
+            if job is None:
+                return
+            try:
+                _render(db, job)
+            except Exception as exc:
+                logger.exception("export job %s failed", job_id)
+                db.rollback()
+                spool_path(job).with_suffix(".part").unlink(missing_ok=True)
+                job.status = ExportJobStatus.failed
+                job.error = str(exc)[:1000]
+                job.finished_at = datetime.now(UTC)
+                job.expires_at = job.finished_at + timedelta(hours=settings.export_retention_hours)
+                db.commit()
+    finally:
+        _slots.release()
+
+
+def _render(db: Session, job: ExportJob) -> None:
+    filters = _filters(job)
+    job.status = ExportJobStatus.running
+    job.rows_total = exports.count(job.kind, **filters)
+    db.commit()
+
+    final = spool_path(job)
+    final.parent.mkdir(parents=True, exist_ok=True)
+    part = final.with_suffix(".part")
+    last_report = time.monotonic()
+
+    def progress(rows: int) -> None:
+        job.rows_done += rows
+
+    with part.open("wb") as out:
+        for chunk in exports.export(job.kind, job.format, progress=progress, **filters):
+            data = chunk.encode() if isinstance(chunk, str) else chunk
+            out.write(data)
+            job.bytes_written += len(data)
+            if time.monotonic() - last_report >= _PROGRESS_INTERVAL_SECONDS:
+                db.commit()
+                last_report = time.monotonic()
+    os.replace(part, final)
+
+    job.status = ExportJobStatus.done
+    job.finished_at = datetime.now(UTC)
+    job.expires_at = job.finished_at + timedelta(hours=settings.export_retention_hours)
+    db.commit()
+
+
+def purge_expired(db: Session) -> int:
+    now = datetime.now(UTC)
+    # Jobs still queued or running after a full retention period were orphaned by
+    # a restart; they go too.
+    stale = now - timedelta(hours=settings.export_retention_hours)
+    condition = or_(
+        ExportJob.expires_at < now,
+        ExportJob.status.in_([ExportJobStatus.queued, ExportJobStatus.running])
+        & (ExportJob.created_at < stale),
+    )
+    jobs = db.execute(select(ExportJob).where(condition)).scalars().all()
+    for job in jobs:
+        spool_path(job).unlink(missing_ok=True)
+        spool_path(job).with_suffix(".part").unlink(missing_ok=True)
+    db.execute(delete(ExportJob).where(ExportJob.id.in_([job.id for job in jobs])))
+    db.commit()
+    return len(jobs)
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import csv
+import enum
+import io
+import uuid
+import zlib
+from collections.abc import Callable, Iterator, Sequence
+from datetime import datetime
+from decimal import Decimal
+from typing import Literal
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Date, DateTime, Enum, Numeric, Row, Select, Uuid, func, literal_column, select
+from sqlalchemy.types import TypeEngine
+
+from app.core.database import SessionLocal, engine
+from app.models.enums import StudentStatus
+from app.models.payment import Payment
+from app.models.student import Student
+from app.models.student_balance import StudentBalance
+from app.services import ledger
+
+
+ExportKind = Literal["students", "payments", "pending"]
+ExportFormat = Literal["csv", "csv.gz", "parquet", "arrow"]
+
+MEDIA_TYPES: dict[str, str] = {
+    "csv": "text/csv",
+    "csv.gz": "application/gzip",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+# Rows fetched per round trip; on Postgres this also turns on a server-side cursor.
+EXPORT_BATCH_SIZE = 2000
+# Rows per Arrow record batch / Parquet row group. Bounds memory for the binary formats.
+ARROW_BATCH_SIZE = 65_536
+
+
+Progress = Callable[[int], None]
+
+
+def _partitions(stmt: Select, progress: Progress | None = None) -> Iterator[Sequence[Row]]:
+    # Callers stream this after the request's session is closed, so it reads
+    # through a session of its own.
+    with SessionLocal() as db:
+        result = db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for rows in result.partitions():
+            yield rows
+            if progress is not None:
+                progress(len(rows))
+
+
+def _header(stmt: Select) -> list[str]:
+    return [column.key for column in stmt.selected_columns]
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def csv_chunks(stmt: Select, progress: Progress | None = None) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(_header(stmt))
+    yield buf.getvalue()
+    for rows in _partitions(stmt, progress):
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows([_text(value) for value in row] for row in rows)
+        yield buf.getvalue()
+
+
+def copy_csv_chunks(stmt: Select, progress: Progress | None = None) -> Iterator[bytes]:
+    # COPY (SELECT ...) TO STDOUT WITH CSV HEADER: Postgres formats the rows and the
+    # chunks are relayed as they arrive. The header comes from the column labels.
+    # Progress counts line breaks, so it runs ahead for values containing newlines.
+    compiled = stmt.compile(dialect=engine.dialect)
+    header_lines = 1
+    with engine.connect() as conn:
+        cursor = conn.connection.driver_connection.cursor()
+        with cursor, cursor.copy(
+            f"COPY ({compiled}) TO STDOUT WITH CSV HEADER", compiled.params
+        ) as copy:
+            for chunk in copy:
+                data = bytes(chunk)
+                yield data
+                if progress is not None:
+                    lines = data.count(b"\n")
+                    progress(lines - header_lines)
+                    header_lines = 0
+
+
+def gzip_chunks(chunks: Iterator[str | bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _arrow_type(sa_type: TypeEngine) -> pa.DataType:
+    if isinstance(sa_type, Uuid):
+        return pa.uuid()
+    if isinstance(sa_type, Enum):
+        return pa.dictionary(pa.int8(), pa.string())
+    if isinstance(sa_type, Numeric) and sa_type.precision is not None:
+        return pa.decimal128(sa_type.precision, sa_type.scale or 0)
+    if isinstance(sa_type, DateTime):
+        # Stored as UTC; SQLite hands them back naive, which Arrow reads as UTC too.
+        return pa.timestamp("us", tz="UTC") if sa_type.timezone else pa.timestamp("us")
+    if isinstance(sa_type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def _arrow_value(value):
+    if isinstance(value, uuid.UUID):
+        return value.bytes
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+def _arrow_schema(stmt: Select) -> pa.Schema:
+    return pa.schema(
+        [pa.field(column.key, _arrow_type(column.type)) for column in stmt.selected_columns]
+    )
+
+
+def _record_batches(
+    stmt: Select, schema: pa.Schema, progress: Progress | None
+) -> Iterator[pa.RecordBatch]:
+    def to_batch(rows: list) -> pa.RecordBatch:
+        return pa.record_batch(
+            [
+                pa.array([_arrow_value(row[i]) for row in rows], type=field.type)
+                for i, field in enumerate(schema)
+            ],
+            schema=schema,
+        )
+
+    pending: list = []
+    for rows in _partitions(stmt, progress):
+        pending.extend(rows)
+        if len(pending) >= ARROW_BATCH_SIZE:
+            yield to_batch(pending)
+            pending = []
+    if pending:
+        yield to_batch(pending)
+
+
+class _ChunkSink(io.RawIOBase):
+    # Write-only file the Parquet/Arrow writers can use, drained between batches.
+    # tell() keeps counting across drains since the writers record file offsets.
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _columnar_chunks(
+    stmt: Select, fmt: ExportFormat, progress: Progress | None
+) -> Iterator[bytes]:
+    schema = _arrow_schema(stmt)
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_file(sink, schema)
+    with writer:
+        for batch in _record_batches(stmt, schema, progress):
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def render(
+    stmt: Select,
+    fmt: ExportFormat,
+    copy_stmt: Select | None = None,
+    progress: Progress | None = None,
+) -> Iterator[str | bytes]:
+    # copy_stmt: a Postgres-formatted variant of stmt for COPY, used for CSV there.
+    if fmt in ("parquet", "arrow"):
+        return _columnar_chunks(stmt, fmt, progress)
+    if copy_stmt is not None and engine.dialect.name == "postgresql":
+        chunks = copy_csv_chunks(copy_stmt, progress)
+    else:
+        chunks = csv_chunks(stmt, progress)
+    return gzip_chunks(chunks) if fmt == "csv.gz" else chunks
+
+
+def students_query() -> Select:
+    return select(
+        Student.student_code,
+        Student.name,
+        Student.class_name,
+        Student.section,
+        Student.status,
+        Student.created_at,
+    ).order_by(Student.student_code)
+
+
+def pending_query(
+    status: StudentStatus | None = None, min_pending: Decimal | None = None
+) -> Select:
+    return ledger.pending_query(status=status, min_pending=min_pending).with_only_columns(
+        Student.student_code,
+        Student.name,
+        StudentBalance.expected_fee,
+        StudentBalance.paid_total,
+        StudentBalance.pending,
+    )
+
+
+def _payment_filters(
+    student_id: uuid.UUID | None, from_dt: datetime | None, to_dt: datetime | None
+) -> list:
+    filters = []
+    if student_id:
+        filters.append(Payment.student_id == student_id)
+    if from_dt:
+        filters.append(Payment.paid_at >= from_dt)
+    if to_dt:
+        filters.append(Payment.paid_at <= to_dt)
+    return filters
+
+
+def payments_query(
+    student_id: uuid.UUID | None = None,
+    from_dt: datetime | None = None,
+    to_dt: datetime | None = None,
+) -> Select:
+    return (
+        select(
+            Payment.receipt_no,
+            Payment.student_id,
+            Payment.amount,
+            Payment.mode,
+            Payment.reference_no,
+            Payment.notes,
+            Payment.paid_at,
+            Payment.created_by,
+        )
+        .where(*_payment_filters(student_id, from_dt, to_dt))
+        .order_by(Payment.paid_at.desc())
+    )
+
+
+def payments_copy_query(
+    student_id: uuid.UUID | None = None,
+    from_dt: datetime | None = None,
+    to_dt: datetime | None = None,
+) -> Select:
+    # paid_at is rendered as ISO 8601 in UTC so the file reads the same whatever
+    # the server's TimeZone; NULLs come out as empty fields like the Python writer's.
+    paid_at = func.to_char(
+        func.timezone("UTC", Payment.paid_at),
+        literal_column("""'YYYY-MM-DD"T"HH24:MI:SS.US"+00:00"'"""),
+    )
+    stmt = payments_query(student_id, from_dt, to_dt)
+    return stmt.with_only_columns(
+        *(paid_at.label("paid_at") if c.key == "paid_at" else c for c in stmt.selected_columns)
+    )
+
+
+_QUERIES: dict[str, Callable[..., Select]] = {
+    "students": students_query,
+    "payments": payments_query,
+    "pending": pending_query,
+}
+
+# Filters each export accepts, by keyword.
+FILTERS: dict[str, tuple[str, ...]] = {
+    "students": (),
+    "payments": ("student_id", "from_dt", "to_dt"),
+    "pending": ("status", "min_pending"),
+}
+
+
+def export(
+    kind: ExportKind, fmt: ExportFormat, progress: Progress | None = None, **filters
+) -> Iterator[str | bytes]:
+    stmt = _QUERIES[kind](**filters)
+    copy_stmt = payments_copy_query(**filters) if kind == "payments" else None
+    return render(stmt, fmt, copy_stmt=copy_stmt, progress=progress)
+
+
+def count(kind: ExportKind, **filters) -> int:
+    stmt = _QUERIES[kind](**filters).order_by(None)
+    with SessionLocal() as db:
+        return db.execute(select(func.count()).select_from(stmt.subquery())).scalar_one()
@@ -0,0 +1,91 @@
+"""Expected fee assignment: the student_fee rows and the ledger, set-based."""
+
+from __future__ import annotations
+
+import uuid
+from collections.abc import Mapping
+from datetime import UTC, datetime
+from decimal import Decimal
+
+from sqlalchemy import literal, select
+from sqlalchemy.orm import Session
+
+from app.core.database import upsert_insert
+from app.models.enums import StudentStatus
+from app.models.student import Student
+from app.models.student_fee import StudentFee
+from app.services import ledger
+
+
+def assign(
+    db: Session, amounts: Mapping[uuid.UUID, Decimal], *, updated_by: uuid.UUID
+) -> None:
+    # One multi-row upsert for student_fee, then the batched ledger update.
+    if not amounts:
+        return
+    now = datetime.now(UTC)
+    table = StudentFee.__table__
+    stmt = upsert_insert(db, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.student_id],
+        set_={
+            "expected_fee_amount": stmt.excluded.expected_fee_amount,
+            "last_fee_updated_at": stmt.excluded.last_fee_updated_at,
+            "last_fee_updated_by": stmt.excluded.last_fee_updated_by,
+        },
+    )
+    db.execute(
+        stmt,
+        [
+            {
+                "student_id": student_id,
+                "expected_fee_amount": amount,
+                "last_fee_updated_at": now,
+                "last_fee_updated_by": updated_by,
+            }
+            for student_id, amount in sorted(amounts.items())
+        ],
+    )
+    ledger.set_expected_fees(db, amounts)
+
+
+def assign_where(
+    db: Session,
+    amount: Decimal,
+    *,
+    updated_by: uuid.UUID,
+    class_name: str | None = None,
+    section: str | None = None,
+    status: StudentStatus | None = None,
+) -> int:
+    # The selector stays in SQL: one INSERT ... SELECT ... ON CONFLICT for student_fee
+    # and one UPDATE ... FROM for the balances, however many students match.
+    filters = []
+    if class_name is not None:
+        filters.append(Student.class_name == class_name)
+    if section is not None:
+        filters.append(Student.section == section)
+    if status is not None:
+        filters.append(Student.status == status)
+
+    table = StudentFee.__table__
+    stmt = upsert_insert(db, table).from_select(
+        ["student_id", "expected_fee_amount", "last_fee_updated_at", "last_fee_updated_by"],
+        select(
+            Student.id,
+            literal(amount, table.c.expected_fee_amount.type),
+            literal(datetime.now(UTC), table.c.last_fee_updated_at.type),
+            literal(updated_by, table.c.last_fee_updated_by.type),
+        ).where(*filters),
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[table.c.student_id],
+            set_={
+                "expected_fee_amount": stmt.excluded.expected_fee_amount,
+                "last_fee_updated_at": stmt.excluded.last_fee_updated_at,
+                "last_fee_updated_by": stmt.excluded.last_fee_updated_by,
+            },
+        )
+    )
+    return len(ledger.set_expected_fee_where(db, amount, filters))
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.idempotency_key import IdempotencyKey
+from app.models.payment import Payment
+from app.schemas.payments import PaymentRead
+
+
+# Front cache for replays within this process; the table is the source of truth
+# shared across workers. Entries carry the key's expires_at and stop replaying with it.
+_cache: TTLCache[str, tuple[str, datetime, PaymentRead]] = TTLCache(
+    maxsize=settings.idempotency_cache_size,
+    ttl=settings.idempotency_ttl_hours * 3600,
+)
+
+
+def _check_scope(stored_scope: str, scope: str) -> None:
+    if stored_scope != scope:
+        raise HTTPException(
+            status_code=422, detail="Idempotency-Key was already used for a different request"
+        )
+
+
+def find_replay(db: Session, key: str, scope: str) -> PaymentRead | None:
+    now = datetime.now(UTC)
+    cached = _cache.get(key)
+    if cached is not None:
+        stored_scope, expires_at, payment = cached
+        if expires_at > now:
+            _check_scope(stored_scope, scope)
+            return payment
+        _cache.pop(key)
+
+    row = db.execute(
+        select(IdempotencyKey.scope, IdempotencyKey.expires_at, Payment)
+        .join(Payment, Payment.id == IdempotencyKey.payment_id)
+        .where(IdempotencyKey.key == key)
+        .where(IdempotencyKey.expires_at > now)
+    ).one_or_none()
+    if row is None:
+        return None
+    _check_scope(row.scope, scope)
+    payment = PaymentRead.model_validate(row.Payment)
+    expires_at = row.expires_at
+    if expires_at.tzinfo is None:
+        # SQLite hands back naive datetimes; they are stored as UTC.
+        expires_at = expires_at.replace(tzinfo=UTC)
+    _cache.set(key, (row.scope, expires_at, payment))
+    return payment
+
+
+def commit(db: Session, key: str | None, scope: str, payment: PaymentRead) -> PaymentRead:
+    # Stores the key in the payment's own transaction so both commit together. A
+    # concurrent retry that raced past find_replay fails on the unique index, and
+    # gets the winner's payment back instead.
+    if key is None:
+        db.commit()
+        return payment
+
+    now = datetime.now(UTC)
+    expires_at = now + timedelta(hours=settings.idempotency_ttl_hours)
+    db.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.key == key).where(IdempotencyKey.expires_at <= now)
+    )
+    db.add(IdempotencyKey(key=key, scope=scope, payment_id=payment.id, expires_at=expires_at))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        replay = find_replay(db, key, scope)
+        if replay is None:
+            raise
+        return replay
+    _cache.set(key, (scope, expires_at, payment))
+    return payment
+
+
+def purge_expired(db: Session) -> int:
+    result = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.now(UTC)))
+    db.commit()
+    return result.rowcount
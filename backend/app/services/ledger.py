@@ -0,0 +1,228 @@
+"""Keeps student_balance in step with payments and fees, inside the writer's transaction."""
+
+from __future__ import annotations
+
+import uuid
+from collections import defaultdict
+from collections.abc import Iterable, Mapping
+from datetime import UTC, datetime
+from decimal import Decimal
+
+from sqlalchemy import Select, bindparam, func, literal, or_, select, text, update
+from sqlalchemy.orm import Session
+
+from app.models.enums import StudentStatus
+from app.models.payment import Payment
+from app.models.student import Student
+from app.models.student_balance import StudentBalance
+from app.models.student_fee import StudentFee
+from app.schemas.payments import PaymentRead
+from app.services import balance_cache, class_rollup, summary, watermark
+
+
+def apply_payments(db: Session, payments: Iterable[PaymentRead]) -> None:
+    deltas: defaultdict[uuid.UUID, Decimal] = defaultdict(Decimal)
+    for payment in payments:
+        deltas[payment.student_id] += Decimal(payment.amount)
+    if not deltas:
+        return
+
+    table = StudentBalance.__table__
+    stmt = (
+        update(table)
+        .where(table.c.student_id == bindparam("b_student_id"))
+        .values(
+            paid_total=table.c.paid_total + bindparam("b_delta"),
+            pending=table.c.pending - bindparam("b_delta"),
+            updated_at=bindparam("b_now"),
+        )
+    )
+    now = datetime.now(UTC)
+    # Sorted so concurrent bulk writes lock balance rows in the same order.
+    db.execute(
+        stmt,
+        [
+            {"b_student_id": student_id, "b_delta": delta, "b_now": now}
+            for student_id, delta in sorted(deltas.items())
+        ],
+    )
+    class_rollup.apply_balance_deltas(db, paid=deltas)
+    balance_cache.mark_changed(db, deltas)
+    summary.invalidate(db)
+    watermark.bump(db)
+
+
+def set_expected_fee(db: Session, student_id: uuid.UUID, amount: Decimal) -> None:
+    set_expected_fees(db, {student_id: amount})
+
+
+def set_expected_fees(db: Session, amounts: Mapping[uuid.UUID, Decimal]) -> None:
+    if not amounts:
+        return
+    ids = sorted(amounts)
+    previous = dict(
+        db.execute(
+            select(StudentBalance.student_id, StudentBalance.expected_fee)
+            .where(StudentBalance.student_id.in_(ids))
+            .order_by(StudentBalance.student_id)
+            .with_for_update()
+        ).all()
+    )
+    table = StudentBalance.__table__
+    now = datetime.now(UTC)
+    db.execute(
+        update(table)
+        .where(table.c.student_id == bindparam("b_student_id"))
+        .values(
+            expected_fee=bindparam("b_amount"),
+            pending=bindparam("b_amount") - table.c.paid_total,
+            updated_at=bindparam("b_now"),
+        ),
+        [
+            {"b_student_id": student_id, "b_amount": amounts[student_id], "b_now": now}
+            for student_id in ids
+        ],
+    )
+    class_rollup.apply_balance_deltas(
+        db, expected={sid: amounts[sid] - previous[sid] for sid in ids if sid in previous}
+    )
+    balance_cache.mark_changed(db, ids)
+    summary.invalidate(db)
+    watermark.bump(db)
+
+
+def set_expected_fee_where(db: Session, amount: Decimal, filters: list) -> list[uuid.UUID]:
+    # One UPDATE ... FROM over the students matching filters (conditions on Student).
+    # On Postgres the subquery locks their balance rows in id order and carries the old
+    # fee and class out through RETURNING for the rollup deltas; no ids are sent back in.
+    table = StudentBalance.__table__
+    old = (
+        select(
+            table.c.student_id.label("locked_id"),
+            table.c.expected_fee.label("old_fee"),
+            Student.class_name,
+            Student.section,
+        )
+        .join(Student, Student.id == table.c.student_id)
+        .where(*filters)
+        .order_by(table.c.student_id)
+        .with_for_update(of=table)
+    )
+    amount_param = literal(amount, table.c.expected_fee.type)
+    stmt = update(table).values(
+        expected_fee=amount_param,
+        pending=amount_param - table.c.paid_total,
+        updated_at=datetime.now(UTC),
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        locked = old.subquery()
+        rows = db.execute(
+            stmt.where(table.c.student_id == locked.c.locked_id).returning(
+                locked.c.locked_id, locked.c.old_fee, locked.c.class_name, locked.c.section
+            )
+        ).all()
+    else:
+        # SQLite's RETURNING can't see the FROM subquery; read the old values first
+        # (the database lock covers the whole transaction anyway).
+        rows = db.execute(old).all()
+        matched = select(Student.id).where(*filters)
+        db.execute(stmt.where(table.c.student_id.in_(matched)))
+    deltas: defaultdict[class_rollup.Group, Decimal] = defaultdict(Decimal)
+    for row in rows:
+        deltas[class_rollup.group_of(row.class_name, row.section)] += amount - row.old_fee
+    class_rollup.apply_group_deltas(db, expected=deltas)
+    ids = [row.locked_id for row in rows]
+    balance_cache.mark_changed(db, ids)
+    summary.invalidate(db)
+    watermark.bump(db)
+    return ids
+
+
+def pending_query(
+    *, status: StudentStatus | None = None, min_pending: Decimal | None = None
+) -> Select:
+    # Served by the partial index ix_student_balance_pending, so the cost tracks the
+    # number of students with something outstanding rather than the whole roll.
+    stmt = (
+        select(
+            StudentBalance.student_id,
+            Student.student_code,
+            Student.name,
+            StudentBalance.expected_fee,
+            StudentBalance.paid_total,
+            StudentBalance.pending,
+        )
+        .join(Student, Student.id == StudentBalance.student_id)
+        .where(StudentBalance.pending != 0)
+    )
+    if status is not None:
+        stmt = stmt.where(Student.status == status)
+    if min_pending is not None:
+        stmt = stmt.where(StudentBalance.pending >= min_pending)
+    return stmt.order_by(StudentBalance.pending.desc(), Student.student_code)
+
+
+def _computed_balances():
+    paid = (
+        select(Payment.student_id, func.sum(Payment.amount).label("paid_total"))
+        .group_by(Payment.student_id)
+        .subquery()
+    )
+    expected_fee = func.coalesce(StudentFee.expected_fee_amount, 0)
+    paid_total = func.coalesce(paid.c.paid_total, 0)
+    return (
+        select(
+            Student.id.label("student_id"),
+            expected_fee.label("expected_fee"),
+            paid_total.label("paid_total"),
+            (expected_fee - paid_total).label("pending"),
+        )
+        .outerjoin(StudentFee, StudentFee.student_id == Student.id)
+        .outerjoin(paid, paid.c.student_id == Student.id)
+        .subquery()
+    )
+
+
+def find_drift(db: Session) -> list:
+    computed = _computed_balances()
+    return db.execute(
+        select(
+            computed,
+            StudentBalance.expected_fee.label("stored_expected_fee"),
+            StudentBalance.paid_total.label("stored_paid_total"),
+            StudentBalance.pending.label("stored_pending"),
+        )
+        .outerjoin(StudentBalance, StudentBalance.student_id == computed.c.student_id)
+        .where(
+            or_(
+                StudentBalance.student_id.is_(None),
+                StudentBalance.expected_fee != computed.c.expected_fee,
+                StudentBalance.paid_total != computed.c.paid_total,
+                StudentBalance.pending != computed.c.pending,
+            )
+        )
+    ).all()
+
+
+def rebuild(db: Session) -> int:
+    if db.get_bind().dialect.name == "postgresql":
+        # Hold off payment and fee writers so the recomputed totals can't race them.
+        db.execute(text("LOCK TABLE payments, student_fee, students IN SHARE MODE"))
+    drift = find_drift(db)
+    for row in drift:
+        db.merge(
+            StudentBalance(
+                student_id=row.student_id,
+                expected_fee=row.expected_fee,
+                paid_total=row.paid_total,
+                pending=row.pending,
+            )
+        )
+    if drift:
+        db.flush()
+        class_rollup.recompute(db)
+    balance_cache.mark_changed(db, [row.student_id for row in drift])
+    summary.invalidate(db)
+    watermark.bump(db)
+    db.commit()
+    return len(drift)
@@ -0,0 +1,76 @@
+"""Password verification on a bounded process pool, off the request threads.
+
+bcrypt is slow CPU work on purpose. Run on the threadpool that every sync route
+shares, a burst of logins at shift start holds it up for everyone. Hashes are checked
+in PASSWORD_HASH_WORKERS processes instead (one per core by default). Each worker
+process allows PASSWORD_HASH_MAX_PENDING verifications queued or running at once, and
+answers 429 beyond that. Callers await the result on the event loop, so a login in
+progress holds no threadpool thread.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.security import verify_password
+
+
+_slots = threading.BoundedSemaphore(settings.password_hash_max_pending)
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> ProcessPoolExecutor:
+    # Started on first use. forkserver children don't inherit the server's threads.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.password_hash_workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return _pool
+
+
+def _discard(pool: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+async def verify(password: str, password_hash: str) -> bool:
+    if not _slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many logins in progress; retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        pool = _executor()
+        try:
+            return await asyncio.wrap_future(pool.submit(verify_password, password, password_hash))
+        except BrokenProcessPool:
+            # A worker died (OOM kill, say); start a fresh pool and try once more.
+            _discard(pool)
+            return await asyncio.wrap_future(
+                _executor().submit(verify_password, password, password_hash)
+            )
+    finally:
+        _slots.release()
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
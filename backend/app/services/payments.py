@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import uuid
+from datetime import UTC, datetime
+from decimal import Decimal
+
+from sqlalchemy import String, case, cast, func, insert, literal, select
+from sqlalchemy.orm import Session, aliased
+
+from app.models.payment import Payment
+from app.models.student import Student
+from app.schemas.payments import PaymentCreate, PaymentRead, PaymentReverseRequest
+from app.services import ledger, rollups
+from app.services.receipts import get_receipt_allocator
+
+
+_INSERT_COLUMNS = [
+    "id",
+    "receipt_no",
+    "student_id",
+    "amount",
+    "mode",
+    "reference_no",
+    "notes",
+    "paid_at",
+    "created_by",
+    "created_at",
+]
+
+
+def record_written(db: Session, payments: list[PaymentRead]) -> None:
+    # Derived tables that must move in the same transaction as the payment rows.
+    ledger.apply_payments(db, payments)
+    rollups.apply_payments(db, payments)
+
+
+def _insert_returning(db: Session, source) -> PaymentRead | None:
+    stmt = (
+        insert(Payment)
+        .from_select(_INSERT_COLUMNS, source)
+        .returning(*Payment.__table__.columns)
+    )
+    row = db.execute(stmt).one_or_none()
+    if row is None:
+        return None
+    payment = PaymentRead.model_validate(row)
+    record_written(db, [payment])
+    return payment
+
+
+def insert_payment(
+    db: Session, payload: PaymentCreate, *, created_by: uuid.UUID
+) -> PaymentRead | None:
+    # One INSERT ... SELECT ... RETURNING: the student check, receipt allocation
+    # and insert share a statement; the derived-table updates follow. Returns None
+    # when the student does not exist; the caller must roll back in that case.
+    table = Payment.__table__.c
+    now = datetime.now(UTC)
+    source = select(
+        literal(uuid.uuid4(), table.id.type),
+        get_receipt_allocator().receipt_no_column(db),
+        Student.id,
+        literal(payload.amount, table.amount.type),
+        # Explicit cast: an untyped parameter would reach the enum column as text.
+        cast(literal(payload.mode.value), table.mode.type),
+        literal(payload.reference_no, table.reference_no.type),
+        literal(payload.notes, table.notes.type),
+        literal(payload.paid_at or now, table.paid_at.type),
+        literal(created_by, table.created_by.type),
+        literal(now, table.created_at.type),
+    ).where(Student.id == payload.student_id)
+    return _insert_returning(db, source)
+
+
+def insert_reversal(
+    db: Session,
+    payment_id: uuid.UUID,
+    payload: PaymentReverseRequest,
+    *,
+    created_by: uuid.UUID,
+) -> PaymentRead | None:
+    # Same single-statement shape as insert_payment, reading the original payment
+    # inside the INSERT. Returns None when the payment does not exist.
+    table = Payment.__table__.c
+    original = aliased(Payment)
+    now = datetime.now(UTC)
+
+    if payload.amount is None:
+        amount = -original.amount
+    else:
+        magnitude = abs(Decimal(payload.amount))
+        amount = case(
+            (original.amount > 0, literal(-magnitude, table.amount.type)),
+            else_=literal(magnitude, table.amount.type),
+        )
+
+    reason_note = (
+        literal("REVERSAL of ", String)
+        + original.receipt_no
+        + literal(f": {payload.reason}", String)
+    )
+    notes = case(
+        (func.coalesce(original.notes, "") == "", reason_note),
+        else_=reason_note + literal(" | orig_notes: ", String) + original.notes,
+    )
+
+    source = select(
+        literal(uuid.uuid4(), table.id.type),
+        get_receipt_allocator().receipt_no_column(db),
+        original.student_id,
+        amount,
+        original.mode,
+        original.reference_no,
+        notes,
+        literal(now, table.paid_at.type),
+        literal(created_by, table.created_by.type),
+        literal(now, table.created_at.type),
+    ).where(original.id == payment_id)
+    return _insert_returning(db, source)
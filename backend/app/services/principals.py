@@ -0,0 +1,67 @@
+"""Authenticated users as seen by get_current_user, cached by user id.
+
+Most requests then skip the users table. Entries expire after
+AUTH_CACHE_TTL_SECONDS. Updating or deleting a User through the ORM evicts that id
+once the transaction commits; changes made another way (bulk UPDATE statements, psql,
+another worker) show up when the entry expires, or call invalidate().
+"""
+
+from __future__ import annotations
+
+import uuid
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import run_after_commit
+from app.models.enums import UserRole
+from app.models.user import User
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: uuid.UUID
+    username: str
+    role: UserRole
+
+
+_cache: TTLCache[uuid.UUID, Principal] = TTLCache(
+    maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl_seconds
+)
+
+
+def get(db: Session, user_id: uuid.UUID) -> Principal | None:
+    principal = _cache.get(user_id)
+    if principal is not None:
+        return principal
+    user = db.get(User, user_id)
+    if user is None:
+        return None
+    principal = Principal(id=user.id, username=user.username, role=user.role)
+    _cache.set(user_id, principal)
+    return principal
+
+
+def invalidate(user_id: uuid.UUID) -> None:
+    _cache.pop(user_id)
+
+
+def clear() -> None:
+    _cache.clear()
+
+
+def stats() -> dict[str, int]:
+    return _cache.stats()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _evict_on_commit(_mapper, _connection, target: User) -> None:
+    session = object_session(target)
+    if session is None:
+        return
+    user_id = target.id
+    run_after_commit(session, ("principal", user_id), lambda: invalidate(user_id))
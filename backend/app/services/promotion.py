@@ -0,0 +1,112 @@
+"""Year-end roll-over: move active students up a class, or mark graduates inactive.
+
+The whole mapping runs in one transaction. On Postgres it takes a SHARE ROW EXCLUSIVE
+lock on students so no student joins or leaves these classes meanwhile. Then one read
+locks the balances for the rollup deltas, one UPDATE marks the graduates, and one UPDATE
+with a CASE over the old class moves the rest. Each student moves at most one step, even
+when the mapping chains ("5" -> "6" and "6" -> "7", or "11" -> "12" and "12" -> None).
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from datetime import UTC, datetime
+
+from sqlalchemy import case, func, select, text, update
+from sqlalchemy.orm import Session
+
+from app.core.database import run_after_commit
+from app.models.enums import StudentStatus
+from app.models.student import Student
+from app.models.student_balance import StudentBalance
+from app.services import class_rollup, counts, suggest, watermark
+
+
+# Old class -> new class, or None to mark the students inactive.
+Promotion = Mapping[str, str | None]
+
+
+def plan(db: Session, mapping: Promotion) -> dict[str, int]:
+    # Active students each entry of the mapping would touch.
+    rows = db.execute(
+        select(Student.class_name, func.count())
+        .where(Student.class_name.in_(list(mapping)), Student.status == StudentStatus.active)
+        .group_by(Student.class_name)
+    ).all()
+    found = dict(rows)
+    return {class_name: found.get(class_name, 0) for class_name in mapping}
+
+
+def promote(db: Session, mapping: Promotion) -> dict[str, int]:
+    if db.get_bind().dialect.name == "postgresql":
+        # Student writes wait (reads don't), so the UPDATEs below match exactly the
+        # rows read here without their ids being sent back.
+        db.execute(text("LOCK TABLE students IN SHARE ROW EXCLUSIVE MODE"))
+    selected = (Student.class_name.in_(list(mapping)), Student.status == StudentStatus.active)
+    rows = db.execute(
+        select(
+            Student.id,
+            Student.student_code,
+            Student.name,
+            Student.class_name,
+            Student.section,
+            StudentBalance.expected_fee,
+            StudentBalance.paid_total,
+        )
+        .join(StudentBalance, StudentBalance.student_id == Student.id)
+        .where(*selected)
+        .order_by(Student.id)
+        .with_for_update(of=StudentBalance)
+    ).all()
+    moves = {old: new for old, new in mapping.items() if new is not None}
+    graduates = [old for old, new in mapping.items() if new is None]
+    moved = [r for r in rows if r.class_name in moves]
+    graduated = [r for r in rows if r.class_name not in moves]
+
+    table = Student.__table__
+    now = datetime.now(UTC)
+    # Graduates first: a class can be both a move target and a graduating key
+    # ("11" -> "12", "12" -> None), and only its old students graduate.
+    if graduated:
+        db.execute(
+            update(table)
+            .where(table.c.class_name.in_(graduates), table.c.status == StudentStatus.active)
+            .values(status=StudentStatus.inactive, updated_at=now)
+        )
+    if moved:
+        db.execute(
+            update(table)
+            .where(table.c.class_name.in_(list(moves)), table.c.status == StudentStatus.active)
+            .values(class_name=case(moves, value=table.c.class_name), updated_at=now)
+        )
+        class_rollup.move_students(
+            db,
+            [
+                (
+                    class_rollup.group_of(r.class_name, r.section),
+                    class_rollup.group_of(moves[r.class_name], r.section),
+                    r.expected_fee,
+                    r.paid_total,
+                )
+                for r in moved
+            ],
+        )
+
+    suggest.mark_written(
+        db,
+        [
+            (r.id, r.student_code, r.name, moves[r.class_name], r.section, StudentStatus.active)
+            for r in moved
+        ]
+        + [
+            (r.id, r.student_code, r.name, r.class_name, r.section, StudentStatus.inactive)
+            for r in graduated
+        ],
+    )
+    watermark.bump(db)
+    run_after_commit(db, "student_counts", lambda: counts.invalidate("students"))
+
+    done = dict.fromkeys(mapping, 0)
+    for r in rows:
+        done[r.class_name] += 1
+    return done
@@ -0,0 +1,162 @@
+"""Receipt number allocation strategies (see "Receipt numbers" in the README).
+
+row_lock is gapless but serialises writers; sequence and block never hold a lock
+for the length of a payment transaction and may leave gaps in the numbering.
+"""
+
+from __future__ import annotations
+
+import threading
+from abc import ABC, abstractmethod
+from datetime import UTC, datetime
+
+from sqlalchemy import String, cast, func, insert, literal, select, text, update
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models.receipt_sequence import ReceiptSequence
+
+
+class ReceiptAllocator(ABC):
+    @abstractmethod
+    def allocate(self, db: Session, count: int = 1) -> list[str]: ...
+
+    def receipt_no_column(self, db: Session) -> ColumnElement[str]:
+        # SQL expression yielding one receipt number inside a larger INSERT, so the
+        # allocation rides along with the payment write instead of a round trip of
+        # its own where the strategy allows it.
+        (receipt_no,) = self.allocate(db)
+        return literal(receipt_no, String)
+
+
+class RowLockAllocator(ReceiptAllocator):
+    def allocate(self, db: Session, count: int = 1) -> list[str]:
+        seq = (
+            db.execute(
+                select(ReceiptSequence).where(ReceiptSequence.id == 1).with_for_update()
+            )
+            .scalars()
+            .one_or_none()
+        )
+        if not seq:
+            seq = ReceiptSequence(id=1)
+            db.add(seq)
+            db.flush()
+            db.refresh(seq)
+
+        start = seq.current_number + 1
+        seq.current_number += count
+        seq.updated_at = datetime.now(UTC)
+        return [f"{seq.prefix}{n}" for n in range(start, seq.current_number + 1)]
+
+    def receipt_no_column(self, db: Session) -> ColumnElement[str]:
+        if db.get_bind().dialect.name != "postgresql":
+            return super().receipt_no_column(db)
+        # Data-modifying CTE: the row is locked and bumped by the payment INSERT
+        # itself. Relies on the receipt_sequence row seeded by the initial migration.
+        bumped = (
+            update(ReceiptSequence)
+            .where(ReceiptSequence.id == 1)
+            .values(current_number=ReceiptSequence.current_number + 1, updated_at=func.now())
+            .returning(
+                (ReceiptSequence.prefix + cast(ReceiptSequence.current_number, String)).label(
+                    "receipt_no"
+                )
+            )
+            .cte("receipt_seq")
+        )
+        return select(bumped.c.receipt_no).scalar_subquery()
+
+
+class SequenceAllocator(ReceiptAllocator):
+    sequence_name = "receipt_no_seq"
+
+    def __init__(self) -> None:
+        self._prefix: str | None = None
+
+    def _get_prefix(self, db: Session) -> str:
+        # The prefix is read once per process; restart workers after changing it.
+        if self._prefix is None:
+            prefix = db.execute(
+                select(ReceiptSequence.prefix).where(ReceiptSequence.id == 1)
+            ).scalar_one_or_none()
+            self._prefix = prefix if prefix is not None else settings.receipt_prefix
+        return self._prefix
+
+    def allocate(self, db: Session, count: int = 1) -> list[str]:
+        prefix = self._get_prefix(db)
+        numbers = db.execute(
+            text(f"SELECT nextval('{self.sequence_name}') FROM generate_series(1, :n)"),
+            {"n": count},
+        ).scalars()
+        return [f"{prefix}{n}" for n in numbers]
+
+    def receipt_no_column(self, db: Session) -> ColumnElement[str]:
+        return literal(self._get_prefix(db), String) + cast(
+            func.nextval(self.sequence_name), String
+        )
+
+
+class BlockAllocator(ReceiptAllocator):
+    def __init__(self, block_size: int) -> None:
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._prefix = ""
+        self._next = 1
+        self._end = 0
+
+    def _lease(self, db: Session, size: int) -> None:
+        now = datetime.now(UTC)
+        stmt = (
+            update(ReceiptSequence)
+            .where(ReceiptSequence.id == 1)
+            .values(current_number=ReceiptSequence.current_number + size, updated_at=now)
+            .returning(ReceiptSequence.prefix, ReceiptSequence.current_number)
+        )
+        # Own short transaction on a separate connection of the session's engine: the
+        # row lock is released as soon as the range is reserved instead of being held
+        # until the caller's payment commits.
+        with db.get_bind().engine.begin() as conn:
+            row = conn.execute(stmt).one_or_none()
+            if row is None:
+                conn.execute(insert(ReceiptSequence).values(id=1, current_number=0, updated_at=now))
+                row = conn.execute(stmt).one()
+        self._prefix = row.prefix
+        self._next = row.current_number - size + 1
+        self._end = row.current_number
+
+    def allocate(self, db: Session, count: int = 1) -> list[str]:
+        receipt_nos: list[str] = []
+        with self._lock:
+            while len(receipt_nos) < count:
+                if self._next > self._end:
+                    self._lease(db, max(self.block_size, count - len(receipt_nos)))
+                take = min(count - len(receipt_nos), self._end - self._next + 1)
+                receipt_nos.extend(
+                    f"{self._prefix}{n}" for n in range(self._next, self._next + take)
+                )
+                self._next += take
+        return receipt_nos
+
+
+_allocators: dict[str, ReceiptAllocator] = {}
+_allocators_lock = threading.Lock()
+
+
+def _build_allocator(mode: str) -> ReceiptAllocator:
+    if mode == "sequence" and engine.dialect.name == "postgresql":
+        return SequenceAllocator()
+    # Leases need a connection of their own; SQLite's single one is the caller's.
+    if mode == "block" and engine.dialect.name == "postgresql":
+        return BlockAllocator(settings.receipt_block_size)
+    return RowLockAllocator()
+
+
+def get_receipt_allocator() -> ReceiptAllocator:
+    mode = settings.receipt_allocator
+    with _allocators_lock:
+        if mode not in _allocators:
+            _allocators[mode] = _build_allocator(mode)
+        return _allocators[mode]
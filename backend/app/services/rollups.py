@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import UTC, date, datetime, time, timedelta
+from decimal import Decimal
+
+from sqlalchemy import and_, delete, false, func, insert, or_, select, text, true
+from sqlalchemy.orm import Session
+
+from app.core.database import upsert_insert
+from app.models.enums import PaymentMode
+from app.models.payment import Payment
+from app.models.payment_daily_rollup import PaymentDailyRollup
+from app.schemas.payments import PaymentRead
+from app.services import watermark
+
+
+def utc_day(value: datetime) -> date:
+    # SQLite hands back naive datetimes; they are stored as UTC.
+    return value.astimezone(UTC).date() if value.tzinfo else value.date()
+
+
+def _utc_day_column(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date(func.timezone("UTC", Payment.paid_at))
+    return func.date(Payment.paid_at)
+
+
+def apply_payments(db: Session, payments: Iterable[PaymentRead]) -> None:
+    buckets: defaultdict[tuple[date, PaymentMode], list[Decimal | int]] = defaultdict(
+        lambda: [Decimal(0), 0]
+    )
+    for payment in payments:
+        bucket = buckets[(utc_day(payment.paid_at), payment.mode)]
+        bucket[0] += Decimal(payment.amount)
+        bucket[1] += 1
+    if not buckets:
+        return
+
+    table = PaymentDailyRollup.__table__
+    stmt = upsert_insert(db, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.day, table.c.mode],
+        set_={
+            "total": table.c.total + stmt.excluded.total,
+            "count": table.c.count + stmt.excluded.count,
+        },
+    )
+    db.execute(
+        stmt,
+        [
+            {"day": day, "mode": mode, "total": total, "count": count}
+            for (day, mode), (total, count) in sorted(buckets.items())
+        ],
+    )
+
+
+def backfill(db: Session) -> int:
+    if db.get_bind().dialect.name == "postgresql":
+        # Payment writers update the rollup too; keep them out while it is rebuilt.
+        db.execute(text("LOCK TABLE payments IN SHARE MODE"))
+    day = _utc_day_column(db)
+    db.execute(delete(PaymentDailyRollup))
+    result = db.execute(
+        insert(PaymentDailyRollup).from_select(
+            ["day", "mode", "total", "count"],
+            select(day, Payment.mode, func.sum(Payment.amount), func.count()).group_by(
+                day, Payment.mode
+            ),
+        )
+    )
+    watermark.bump(db)
+    db.commit()
+    return result.rowcount
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.astimezone(UTC) if value.tzinfo else value.replace(tzinfo=UTC)
+
+
+def split_range(from_dt: datetime | None, to_dt: datetime | None):
+    # Splits paid_at >= from_dt AND paid_at <= to_dt into a condition on whole UTC
+    # days of the rollup and, when the bounds are not day-aligned, a condition on
+    # payments covering just the partial days at either end (None if there are none).
+    start = _as_utc(from_dt) if from_dt is not None else None
+    end = _as_utc(to_dt) if to_dt is not None else None
+
+    full_start = None
+    if start is not None:
+        full_start = datetime.combine(start.date(), time.min, tzinfo=UTC)
+        if full_start < start:
+            full_start += timedelta(days=1)
+    full_end = None
+    if end is not None:
+        full_end = datetime.combine((end + timedelta(microseconds=1)).date(), time.min, tzinfo=UTC)
+
+    if full_start is not None and full_end is not None and full_start >= full_end:
+        return false(), and_(Payment.paid_at >= start, Payment.paid_at <= end)
+
+    days = []
+    if full_start is not None:
+        days.append(PaymentDailyRollup.day >= full_start.date())
+    if full_end is not None:
+        days.append(PaymentDailyRollup.day < full_end.date())
+    edges = []
+    if start is not None and start < full_start:
+        edges.append(and_(Payment.paid_at >= start, Payment.paid_at < full_start))
+    if end is not None and full_end <= end:
+        edges.append(and_(Payment.paid_at >= full_end, Payment.paid_at <= end))
+    return and_(true(), *days), (or_(*edges) if edges else None)
+
+
+def edge_total(db: Session, condition) -> Decimal:
+    return Decimal(
+        db.execute(select(func.coalesce(func.sum(Payment.amount), 0)).where(condition)).scalar_one()
+    )
@@ -0,0 +1,295 @@
+"""Bulk student import: rows are validated and upserted a chunk at a time.
+
+Each chunk is one transaction. It does a locked read of the students already on file,
+one multi-row INSERT ... ON CONFLICT (student_code) DO UPDATE, and then the
+student_fee, student_balance and class rollup rows, all set-based.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import uuid
+from collections.abc import Iterator
+from datetime import UTC, datetime
+from decimal import Decimal
+from typing import BinaryIO, Literal
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.database import run_after_commit, upsert_insert
+from app.models.enums import StudentStatus
+from app.models.student import Student
+from app.models.student_balance import StudentBalance
+from app.models.student_fee import StudentFee
+from app.schemas.students import StudentImportError, StudentImportResult, StudentImportRow
+from app.services import (
+    balance_cache,
+    class_rollup,
+    counts,
+    fees,
+    suggest,
+    summary,
+    watermark,
+)
+
+
+ImportFormat = Literal["csv", "jsonl"]
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+def read_records(file: BinaryIO, fmt: ImportFormat) -> Iterator[tuple[int, dict | str]]:
+    # (line number, record) pairs, or (line number, error) for unparseable lines.
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        line = 2
+        for record in reader:
+            record.pop(None, None)
+            # Blank cells mean "not given", like a missing JSON key.
+            yield line, {key: value for key, value in record.items() if value not in ("", None)}
+            line = reader.line_num + 1
+        return
+
+    for line, raw in enumerate(text, start=1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except json.JSONDecodeError as exc:
+            yield line, f"invalid JSON: {exc.msg}"
+            continue
+        yield line, record if isinstance(record, dict) else "expected a JSON object"
+
+
+class _ConcurrentInsert(SQLAlchemyError):
+    def __str__(self) -> str:
+        return "a student_code in this chunk was created concurrently; retry the import"
+
+
+class _Report:
+    def __init__(self) -> None:
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors: list[StudentImportError] = []
+
+    def fail(self, line: int, student_code: str | None, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(StudentImportError(line=line, student_code=student_code, error=error))
+
+    def result(self) -> StudentImportResult:
+        return StudentImportResult(
+            created=self.created,
+            updated=self.updated,
+            failed=self.failed,
+            errors=self.errors,
+            errors_truncated=self.failed > len(self.errors),
+        )
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}" for err in exc.errors()
+    )
+
+
+def import_students(
+    db: Session, records: Iterator[tuple[int, dict | str]], *, updated_by: uuid.UUID
+) -> StudentImportResult:
+    report = _Report()
+    seen: dict[str, int] = {}
+    chunk: list[tuple[int, StudentImportRow]] = []
+    for line, record in records:
+        if isinstance(record, str):
+            report.fail(line, None, record)
+            continue
+        try:
+            row = StudentImportRow.model_validate(record)
+        except ValidationError as exc:
+            code = record.get("student_code")
+            report.fail(line, code if isinstance(code, str) else None, _validation_message(exc))
+            continue
+        if row.student_code in seen:
+            report.fail(
+                line,
+                row.student_code,
+                f"duplicate student_code; first seen on line {seen[row.student_code]}",
+            )
+            continue
+        seen[row.student_code] = line
+        chunk.append((line, row))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            _import_chunk(db, chunk, report, updated_by)
+            chunk = []
+    if chunk:
+        _import_chunk(db, chunk, report, updated_by)
+    return report.result()
+
+
+def _import_chunk(
+    db: Session,
+    chunk: list[tuple[int, StudentImportRow]],
+    report: _Report,
+    updated_by: uuid.UUID,
+) -> None:
+    try:
+        created, updated = _upsert_chunk(db, [row for _, row in chunk], updated_by)
+        db.commit()
+    except SQLAlchemyError as exc:
+        db.rollback()
+        message = str(getattr(exc, "orig", None) or exc).splitlines()[0]
+        for line, row in chunk:
+            report.fail(line, row.student_code, f"chunk rolled back: {message}")
+        return
+    report.created += created
+    report.updated += updated
+
+
+def _upsert_chunk(
+    db: Session, rows: list[StudentImportRow], updated_by: uuid.UUID
+) -> tuple[int, int]:
+    # Existing students with their balances, locked so payments and fee changes to
+    # them wait for this chunk; their old class and fee drive the rollup deltas.
+    existing = {
+        r.student_code: r
+        for r in db.execute(
+            select(
+                Student.id,
+                Student.student_code,
+                Student.class_name,
+                Student.section,
+                Student.status,
+                StudentBalance.expected_fee,
+                StudentBalance.paid_total,
+            )
+            .join(StudentBalance, StudentBalance.student_id == Student.id)
+            .where(Student.student_code.in_([row.student_code for row in rows]))
+            .order_by(Student.id)
+            .with_for_update()
+        )
+    }
+
+    now = datetime.now(UTC)
+    ids = {
+        row.student_code: existing[row.student_code].id
+        if row.student_code in existing
+        else uuid.uuid4()
+        for row in rows
+    }
+    table = Student.__table__
+    stmt = upsert_insert(db, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.student_code],
+        set_={
+            "name": stmt.excluded.name,
+            "class_name": stmt.excluded.class_name,
+            "section": stmt.excluded.section,
+            "status": stmt.excluded.status,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    ).returning(table.c.id, table.c.student_code)
+    values = [
+        {
+            "id": ids[row.student_code],
+            "student_code": row.student_code,
+            "name": row.name,
+            "class_name": row.class_name,
+            "section": row.section,
+            "status": row.status
+            or (
+                existing[row.student_code].status
+                if row.student_code in existing
+                else StudentStatus.active
+            ),
+            "created_at": now,
+            "updated_at": now,
+        }
+        for row in rows
+    ]
+    returned = db.execute(stmt, values).all()
+    if any(r.id != ids[r.student_code] for r in returned):
+        # Another writer created one of these codes after the read above.
+        raise _ConcurrentInsert()
+
+    new_rows = [row for row in rows if row.student_code not in existing]
+    old_rows = [row for row in rows if row.student_code in existing]
+
+    if new_rows:
+        db.execute(
+            insert(StudentFee),
+            [
+                {
+                    "student_id": ids[row.student_code],
+                    "expected_fee_amount": row.expected_fee_amount or Decimal(0),
+                    "last_fee_updated_at": now if row.expected_fee_amount is not None else None,
+                    "last_fee_updated_by": updated_by if row.expected_fee_amount is not None else None,
+                }
+                for row in new_rows
+            ],
+        )
+        db.execute(
+            insert(StudentBalance),
+            [
+                {
+                    "student_id": ids[row.student_code],
+                    "expected_fee": row.expected_fee_amount or Decimal(0),
+                    "paid_total": Decimal(0),
+                    "pending": row.expected_fee_amount or Decimal(0),
+                    "updated_at": now,
+                }
+                for row in new_rows
+            ],
+        )
+        class_rollup.add_students(
+            db,
+            [
+                (
+                    class_rollup.group_of(row.class_name, row.section),
+                    row.expected_fee_amount or Decimal(0),
+                )
+                for row in new_rows
+            ],
+        )
+
+    moves = []
+    for row in old_rows:
+        old = existing[row.student_code]
+        moves.append(
+            (
+                class_rollup.group_of(old.class_name, old.section),
+                class_rollup.group_of(row.class_name, row.section),
+                old.expected_fee,
+                old.paid_total,
+            )
+        )
+    class_rollup.move_students(db, moves)
+
+    new_fees = {
+        ids[row.student_code]: row.expected_fee_amount
+        for row in old_rows
+        if row.expected_fee_amount is not None
+        and row.expected_fee_amount != existing[row.student_code].expected_fee
+    }
+    fees.assign(db, new_fees, updated_by=updated_by)
+
+    # Names and codes appear in cached balances too.
+    balance_cache.mark_changed(db, [existing[row.student_code].id for row in old_rows])
+    suggest.mark_written(
+        db,
+        [
+            (v["id"], v["student_code"], v["name"], v["class_name"], v["section"], v["status"])
+            for v in values
+        ],
+    )
+    summary.invalidate(db)
+    watermark.bump(db)
+    run_after_commit(db, "student_counts", lambda: counts.invalidate("students"))
+    return len(new_rows), len(old_rows)
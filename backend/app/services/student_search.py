@@ -0,0 +1,48 @@
+"""Substring search over student_code and name.
+
+On Postgres the lower(...) LIKE '%term%' filters are served by the pg_trgm GIN indexes
+from migration 0011, and results are ranked by trigram similarity. Elsewhere the same
+filter is a scan; ranking falls back to exact, then prefix matches.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import case, func, or_
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models.student import Student
+
+
+# Not a backslash: how that is quoted in ESCAPE depends on standard_conforming_strings.
+_ESCAPE = "/"
+
+
+def _like_pattern(term: str) -> str:
+    escaped = term.lower().replace(_ESCAPE, _ESCAPE * 2)
+    escaped = escaped.replace("%", f"{_ESCAPE}%").replace("_", f"{_ESCAPE}_")
+    return f"%{escaped}%"
+
+
+def matches(term: str) -> ColumnElement[bool]:
+    pattern = _like_pattern(term)
+    return or_(
+        func.lower(Student.student_code).like(pattern, escape=_ESCAPE),
+        func.lower(Student.name).like(pattern, escape=_ESCAPE),
+    )
+
+
+def rank(db: Session, term: str) -> ColumnElement:
+    # Higher is better; callers order by rank descending, then student_code.
+    term = term.lower()
+    code = func.lower(Student.student_code)
+    name = func.lower(Student.name)
+    if db.get_bind().dialect.name == "postgresql":
+        return func.greatest(func.similarity(code, term), func.similarity(name, term))
+    prefix = _like_pattern(term)[1:]
+    return case(
+        (code == term, 3),
+        (code.like(prefix, escape=_ESCAPE), 2),
+        (name.like(prefix, escape=_ESCAPE), 1),
+        else_=0,
+    )
@@ -0,0 +1,343 @@
+"""In-memory prefix index for the student picker (/api/students/suggest).
+
+Every student gets one slot in parallel lists. The tokens (the lowercased code, the
+full name and each word of the name) are kept in one sorted list, with the matching
+slot numbers alongside in an array. A lookup is a bisect plus a short scan, and no
+database access. The index is built at startup and updated after each student write
+commits in this process. On Postgres a background thread also picks up rows other
+workers changed, by updated_at, every SUGGEST_REFRESH_SECONDS.
+"""
+
+from __future__ import annotations
+
+import heapq
+import logging
+import sys
+import threading
+import time
+import uuid
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine, run_after_commit
+from app.models.enums import StudentStatus
+from app.models.student import Student
+
+
+logger = logging.getLogger(__name__)
+
+# Matches scanned per lookup before ranking; keeps one-letter queries bounded.
+_SCAN_LIMIT = 200
+# Re-read this far behind the last refresh so slow-committing writes aren't missed.
+_REFRESH_OVERLAP = timedelta(minutes=5)
+
+
+def _tokens(code: str, name: str) -> set[str]:
+    name = name.lower()
+    return {code.lower(), name, *name.split()}
+
+
+class SuggestIndex:
+    def __init__(self) -> None:
+        # _lock guards reads against writes; _write_lock serializes writers, so a batch
+        # can build its new token list from the current one with only _write_lock held.
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._ids: list[uuid.UUID] = []
+        self._codes: list[str] = []
+        self._names: list[str] = []
+        self._classes: list[str | None] = []
+        self._sections: list[str | None] = []
+        self._statuses: list[StudentStatus] = []
+        self._slot_of: dict[uuid.UUID, int] = {}
+        self._tokens: list[str] = []
+        self._token_slots = array("I")
+
+    def clear(self) -> None:
+        with self._write_lock, self._lock:
+            self._reset()
+
+    def _set_fields(self, slot: int, student: tuple) -> None:
+        student_id, code, name, class_name, section, status = student
+        class_name = class_name and sys.intern(class_name)
+        section = section and sys.intern(section)
+        fields = (code, name, class_name, section, status)
+        if slot == len(self._ids):
+            self._slot_of[student_id] = slot
+            self._ids.append(student_id)
+            for column, value in zip(self._field_lists(), fields):
+                column.append(value)
+        else:
+            for column, value in zip(self._field_lists(), fields):
+                column[slot] = value
+
+    def _field_lists(self) -> tuple[list, ...]:
+        return (self._codes, self._names, self._classes, self._sections, self._statuses)
+
+    def _entry(self, slot: int) -> tuple:
+        return (self._ids[slot], *(column[slot] for column in self._field_lists()))
+
+    def upsert(self, students: Iterable[tuple]) -> None:
+        # (id, student_code, name, class_name, section, status) per student.
+        students = list({student[0]: tuple(student) for student in students}.values())
+        with self._write_lock:
+            # Refreshes re-read rows this worker already applied; leave those alone.
+            students = [
+                student
+                for student in students
+                if (slot := self._slot_of.get(student[0])) is None or self._entry(slot) != student
+            ]
+            if len(students) == 1:
+                self._upsert_one(students[0])
+            elif students:
+                self._upsert_many(students)
+
+    def _upsert_one(self, student: tuple) -> None:
+        # In place: a couple of inserts into the token list beat rebuilding it.
+        student_id, code, name = student[:3]
+        with self._lock:
+            slot = self._slot_of.get(student_id)
+            if slot is None:
+                slot = len(self._ids)
+                old_tokens: set[str] = set()
+            else:
+                old_tokens = _tokens(self._codes[slot], self._names[slot])
+            self._set_fields(slot, student)
+            new_tokens = _tokens(code, name)
+            for token in old_tokens - new_tokens:
+                self._remove_token(token, slot)
+            for token in new_tokens - old_tokens:
+                self._add_token(token, slot)
+
+    def _upsert_many(self, students: list[tuple]) -> None:
+        # Merge the batch's sorted tokens into a copy of the token list and swap it in,
+        # so lookups only wait for the swap, not for an insert per token.
+        slots: list[int] = []
+        removed: set[tuple[str, int]] = set()
+        added: list[tuple[str, int]] = []
+        next_slot = len(self._ids)
+        for student_id, code, name, *_ in students:
+            slot = self._slot_of.get(student_id)
+            if slot is None:
+                slot = next_slot
+                next_slot += 1
+                old_tokens: set[str] = set()
+            else:
+                old_tokens = _tokens(self._codes[slot], self._names[slot])
+            slots.append(slot)
+            new_tokens = _tokens(code, name)
+            removed.update((token, slot) for token in old_tokens - new_tokens)
+            added.extend((token, slot) for token in new_tokens - old_tokens)
+
+        if not removed and not added:
+            # Class, section or status changes only: the token list stays as it is.
+            with self._lock:
+                for slot, student in zip(slots, students):
+                    self._set_fields(slot, student)
+            return
+
+        added.sort()
+        kept = zip(self._tokens, self._token_slots)
+        if removed:
+            kept = (pair for pair in kept if pair not in removed)
+        tokens: list[str] = []
+        token_slots = array("I")
+        for token, slot in heapq.merge(kept, added):
+            tokens.append(token)
+            token_slots.append(slot)
+
+        # Lookups only reach a slot through the token list, so new slots can be
+        # filled before the swap; an updated name shows with its old tokens briefly.
+        for slot, student in zip(slots, students):
+            self._set_fields(slot, student)
+        with self._lock:
+            # The old lists are freed after the lock is released.
+            replaced = (self._tokens, self._token_slots)
+            self._tokens = tokens
+            self._token_slots = token_slots
+        del replaced
+
+    def _add_token(self, token: str, slot: int) -> None:
+        pos = bisect_left(self._tokens, token)
+        self._tokens.insert(pos, token)
+        self._token_slots.insert(pos, slot)
+
+    def _remove_token(self, token: str, slot: int) -> None:
+        pos = bisect_left(self._tokens, token)
+        while pos < len(self._tokens) and self._tokens[pos] == token:
+            if self._token_slots[pos] == slot:
+                del self._tokens[pos]
+                del self._token_slots[pos]
+                return
+            pos += 1
+
+    def load(self, students: Iterable[tuple]) -> None:
+        # Bulk build: one sort instead of an insert per token.
+        with self._write_lock, self._lock:
+            self._reset()
+            pairs = []
+            for slot, student in enumerate(students):
+                self._set_fields(slot, student)
+                pairs.extend((token, slot) for token in _tokens(student[1], student[2]))
+            pairs.sort()
+            self._tokens = [token for token, _ in pairs]
+            self._token_slots = array("I", (slot for _, slot in pairs))
+
+    def _prefix_slots(self, prefix: str) -> list[int]:
+        pos = bisect_left(self._tokens, prefix)
+        slots: list[int] = []
+        seen: set[int] = set()
+        while pos < len(self._tokens) and len(slots) < _SCAN_LIMIT:
+            if not self._tokens[pos].startswith(prefix):
+                break
+            slot = self._token_slots[pos]
+            if slot not in seen:
+                seen.add(slot)
+                slots.append(slot)
+            pos += 1
+        return slots
+
+    def suggest(self, query: str, limit: int = 10) -> list[dict]:
+        query = " ".join(query.lower().split())
+        if not query:
+            return []
+        words = query.split(" ")
+        with self._lock:
+            slots = self._prefix_slots(query)
+            if len(words) > 1:
+                # Words in any order: "kumar ravi" finds "Ravi Kumar".
+                # Candidates come from the longest word, usually the most selective.
+                words.sort(key=len, reverse=True)
+                seen = set(slots)
+                for slot in self._prefix_slots(words[0]):
+                    if slot in seen:
+                        continue
+                    name_words = self._names[slot].lower().split()
+                    if all(any(t.startswith(w) for t in name_words) for w in words[1:]):
+                        slots.append(slot)
+
+            def rank(slot: int) -> tuple[int, str]:
+                code = self._codes[slot].lower()
+                if code == query:
+                    return (0, code)
+                if code.startswith(query):
+                    return (1, code)
+                if self._names[slot].lower().startswith(query):
+                    return (2, code)
+                return (3, code)
+
+            return [
+                {
+                    "id": self._ids[slot],
+                    "student_code": self._codes[slot],
+                    "name": self._names[slot],
+                    "class_name": self._classes[slot],
+                    "section": self._sections[slot],
+                    "status": self._statuses[slot],
+                }
+                for slot in sorted(slots, key=rank)[:limit]
+            ]
+
+    def stats(self) -> dict[str, int]:
+        # Approximate: container sizes plus the strings and ids they hold (interned
+        # class/section names and enum members are shared, so they're left out).
+        with self._lock:
+            size = sum(
+                sys.getsizeof(container)
+                for container in (
+                    self._ids,
+                    self._codes,
+                    self._names,
+                    self._classes,
+                    self._sections,
+                    self._statuses,
+                    self._slot_of,
+                    self._tokens,
+                    self._token_slots,
+                )
+            )
+            size += sum(sys.getsizeof(i) for i in self._ids)
+            size += sum(sys.getsizeof(s) for s in self._codes)
+            size += sum(sys.getsizeof(s) for s in self._names)
+            # Tokens that are the code or the full name share those strings only when
+            # equal by identity; count them all to stay on the safe side.
+            size += sum(sys.getsizeof(t) for t in self._tokens)
+            return {"students": len(self._ids), "tokens": len(self._tokens), "bytes": size}
+
+
+index = SuggestIndex()
+
+_COLUMNS = (
+    Student.id,
+    Student.student_code,
+    Student.name,
+    Student.class_name,
+    Student.section,
+    Student.status,
+)
+
+
+def rebuild(db: Session) -> None:
+    result = db.execute(select(*_COLUMNS).execution_options(yield_per=10_000))
+    index.load(tuple(row) for row in result)
+
+
+def entry(student: Student) -> tuple:
+    return tuple(getattr(student, column.key) for column in _COLUMNS)
+
+
+class _Written(dict):
+    # Students written in one transaction, by id; applied to the index on commit.
+    def __call__(self) -> None:
+        index.upsert(self.values())
+
+
+def mark_written(db: Session, students: Iterable[tuple]) -> None:
+    # (id, student_code, name, class_name, section, status) per student.
+    written = run_after_commit(db, "suggest_index", _Written())
+    for student in students:
+        written[student[0]] = tuple(student)
+
+
+def _refresh_forever() -> None:
+    since = datetime.now(UTC)
+    while True:
+        time.sleep(settings.suggest_refresh_seconds)
+        started = datetime.now(UTC)
+        try:
+            with SessionLocal() as db:
+                rows = db.execute(
+                    select(*_COLUMNS).where(Student.updated_at > since - _REFRESH_OVERLAP)
+                ).all()
+            index.upsert(tuple(row) for row in rows)
+            since = started
+        except Exception:
+            logger.exception("student suggest refresh failed; retrying")
+
+
+_refresher: threading.Thread | None = None
+
+
+def start() -> None:
+    global _refresher
+    if _refresher is not None:
+        return
+    try:
+        with SessionLocal() as db:
+            rebuild(db)
+    except Exception:
+        # Not fatal: the index fills from writes and, on Postgres, the refresher.
+        logger.exception("could not build the student suggest index")
+    if engine.dialect.name != "postgresql":
+        return
+    _refresher = threading.Thread(target=_refresh_forever, name="student-suggest-refresh", daemon=True)
+    _refresher.start()
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import run_after_commit
+from app.models.payment_daily_rollup import PaymentDailyRollup
+from app.models.student_balance import StudentBalance
+from app.services import rollups
+
+
+# Per process: a write here clears it on commit, writes on other workers show up
+# once the short TTL expires. Responses carry as_of/stale_seconds either way.
+_cache: TTLCache[tuple, tuple[datetime, dict]] = TTLCache(
+    maxsize=256, ttl=settings.summary_cache_ttl_seconds
+)
+
+
+_generation = 0
+
+
+def _clear() -> None:
+    global _generation
+    _generation += 1
+    _cache.clear()
+
+
+def invalidate(db: Session) -> None:
+    run_after_commit(db, "summary_cache", _clear)
+
+
+def _compute(db: Session, from_dt: datetime | None, to_dt: datetime | None, today) -> dict:
+    days_in_range, edges = rollups.split_range(from_dt, to_dt)
+    row = db.execute(
+        select(
+            func.coalesce(func.sum(PaymentDailyRollup.total).filter(days_in_range), 0).label(
+                "total_collected"
+            ),
+            func.coalesce(func.sum(PaymentDailyRollup.total).filter(PaymentDailyRollup.day >= today), 0).label(
+                "today_total"
+            ),
+            func.coalesce(
+                func.sum(PaymentDailyRollup.total).filter(PaymentDailyRollup.day >= today.replace(day=1)), 0
+            ).label("month_total"),
+            select(func.coalesce(func.sum(StudentBalance.pending), 0))
+            .scalar_subquery()
+            .label("pending_total"),
+        )
+    ).one()
+
+    total_collected = row.total_collected
+    if edges is not None:
+        total_collected += rollups.edge_total(db, edges)
+    return {
+        "total_collected": str(total_collected),
+        "today_total": str(row.today_total),
+        "month_total": str(row.month_total),
+        "pending_total": str(row.pending_total),
+    }
+
+
+def get_summary(db: Session, from_dt: datetime | None, to_dt: datetime | None) -> dict:
+    now = datetime.now(UTC)
+    key = (from_dt, to_dt, now.date())
+    cached = _cache.get(key)
+    if cached is None:
+        generation = _generation
+        cached = (now, _compute(db, from_dt, to_dt, now.date()))
+        # Don't cache a result that a write committed while it was being computed.
+        if generation == _generation:
+            _cache.set(key, cached)
+
+    computed_at, data = cached
+    return {
+        **data,
+        "as_of": computed_at.isoformat(),
+        "stale_seconds": round((now - computed_at).total_seconds(), 3),
+    }
+
+
+def stats() -> dict[str, int]:
+    return _cache.stats()
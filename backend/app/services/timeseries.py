@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from datetime import UTC, date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Literal
+
+from sqlalchemy import Date, Integer, String, cast, func, literal, select, type_coerce
+from sqlalchemy.orm import Session
+
+from app.models.payment import Payment
+from app.models.payment_daily_rollup import PaymentDailyRollup
+from app.models.student import Student
+
+
+Bucket = Literal["day", "week", "month"]
+GroupBy = Literal["mode", "class_name"]
+
+
+def bucket_floor(day: date, bucket: Bucket) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start: date, bucket: Bucket) -> date:
+    if bucket == "day":
+        return start + timedelta(days=1)
+    if bucket == "week":
+        return start + timedelta(days=7)
+    return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def bucket_starts(from_day: date, to_day: date, bucket: Bucket) -> list[date]:
+    starts = []
+    current = bucket_floor(from_day, bucket)
+    while current <= to_day:
+        starts.append(current)
+        current = _next_bucket(current, bucket)
+    return starts
+
+
+def _bucket_column(db: Session, day, bucket: Bucket):
+    # Weeks start on Monday and months on the 1st, matching bucket_floor.
+    if db.get_bind().dialect.name == "postgresql":
+        if bucket == "day":
+            return day
+        return cast(func.date_trunc(bucket, day), Date)
+    if bucket == "week":
+        offset = (cast(func.strftime("%w", day), Integer) + 6) % 7
+        return type_coerce(func.date(day, literal("-") + cast(offset, String) + literal(" days")), Date)
+    if bucket == "month":
+        return type_coerce(func.date(day, "start of month"), Date)
+    return type_coerce(func.date(day), Date)
+
+
+def _utc_day(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date(func.timezone("UTC", Payment.paid_at))
+    return func.date(Payment.paid_at)
+
+
+def collect(
+    db: Session, from_day: date, to_day: date, bucket: Bucket, group_by: GroupBy | None
+) -> dict:
+    if group_by == "class_name":
+        # Class isn't in the rollup; scan the range's payments via the paid_at index.
+        bucket_col = _bucket_column(db, _utc_day(db), bucket)
+        group_cols = [Student.class_name]
+        stmt = (
+            select(bucket_col, *group_cols, func.sum(Payment.amount))
+            .join(Student, Student.id == Payment.student_id)
+            .where(Payment.paid_at >= datetime.combine(from_day, time.min, tzinfo=UTC))
+            .where(Payment.paid_at < datetime.combine(to_day + timedelta(days=1), time.min, tzinfo=UTC))
+        )
+    else:
+        bucket_col = _bucket_column(db, PaymentDailyRollup.day, bucket)
+        group_cols = [PaymentDailyRollup.mode] if group_by == "mode" else []
+        stmt = (
+            select(bucket_col, *group_cols, func.sum(PaymentDailyRollup.total))
+            .where(PaymentDailyRollup.day >= from_day)
+            .where(PaymentDailyRollup.day <= to_day)
+        )
+    rows = db.execute(stmt.group_by(bucket_col, *group_cols)).all()
+
+    starts = bucket_starts(from_day, to_day, bucket)
+    position = {start: i for i, start in enumerate(starts)}
+    series: dict[str | None, list[Decimal]] = {}
+    if group_by is None:
+        series["all"] = [Decimal(0)] * len(starts)
+    for row in rows:
+        if group_by is None:
+            start, total = row
+            key = "all"
+        else:
+            start, group, total = row
+            key = group.value if group_by == "mode" else group
+        series.setdefault(key, [Decimal(0)] * len(starts))[position[start]] += Decimal(total)
+
+    groups = sorted(series, key=lambda g: (g is None, g or ""))
+    return {
+        "bucket": bucket,
+        "group_by": group_by,
+        "starts": [start.isoformat() for start in starts],
+        "groups": groups,
+        "totals": [[str(v) for v in series[g]] for g in groups],
+    }
@@ -0,0 +1,58 @@
+"""Ledger watermark: changes whenever data behind the reports and listings changes.
+
+Writers call bump(db); the watermark advances once their transaction commits, so a
+response tagged with the current value never predates it. On Postgres it is the
+ledger_watermark_seq sequence, shared by every worker and advanced outside the
+writer's transaction so busy writers don't queue on it. Elsewhere it is a counter
+local to the process, prefixed with a per-process id so tags don't repeat after a
+restart.
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.database import engine, run_after_commit
+
+
+logger = logging.getLogger(__name__)
+
+_process_id = uuid.uuid4().hex[:8]
+_counter = itertools.count(1)
+_local = 0
+
+
+def _advance() -> None:
+    global _local
+    if engine.dialect.name == "postgresql":
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("SELECT nextval('ledger_watermark_seq')"))
+        except Exception:
+            # The write has already committed; the next bump moves past it.
+            logger.exception("could not advance the ledger watermark")
+        return
+    _local = next(_counter)
+
+
+def bump(db: Session) -> None:
+    run_after_commit(db, "ledger_watermark", _advance)
+
+
+def current(db: Session) -> str:
+    if db.get_bind().dialect.name == "postgresql":
+        # is_called distinguishes the untouched sequence from one advanced once.
+        return str(
+            db.execute(
+                text(
+                    "SELECT last_value + CASE WHEN is_called THEN 1 ELSE 0 END"
+                    " FROM ledger_watermark_seq"
+                )
+            ).scalar_one()
+        )
+    return f"{_process_id}.{_local}"
@@ -0,0 +1,63 @@
+"""Rows/sec and output size for the payments export in each format and path.
+
+Run against a Postgres database that holds a realistic payments table; the
+benchmark only reads:
+
+    DATABASE_URL=postgresql+psycopg://... python -m benchmarks.payment_export
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from collections.abc import Callable, Iterator
+
+from sqlalchemy import func, select
+
+from app.core.database import SessionLocal, engine
+from app.models.payment import Payment
+from app.services import exports
+
+PATHS: dict[str, Callable[[], Iterator[str | bytes]]] = {
+    "csv/python": lambda: exports.csv_chunks(exports.payments_query()),
+    "csv/copy": lambda: exports.copy_csv_chunks(exports.payments_copy_query()),
+    "csv.gz/copy": lambda: exports.export("payments", "csv.gz"),
+    "parquet": lambda: exports.export("payments", "parquet"),
+    "arrow": lambda: exports.export("payments", "arrow"),
+}
+
+
+def _drain(make_chunks: Callable[[], Iterator[str | bytes]]) -> tuple[int, float]:
+    size = 0
+    started = time.perf_counter()
+    for chunk in make_chunks():
+        size += len(chunk.encode() if isinstance(chunk, str) else chunk)
+    return size, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paths", nargs="+", default=list(PATHS), choices=list(PATHS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=exports.EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("the COPY path needs Postgres; point DATABASE_URL at one")
+    exports.EXPORT_BATCH_SIZE = args.batch_size
+    with SessionLocal() as db:
+        rows = db.execute(select(func.count()).select_from(Payment)).scalar_one()
+
+    print(f"{'path':<13}{'rows':>10}{'MB':>9}{'seconds':>10}{'rows/sec':>12}")
+    for name in args.paths:
+        # Best of N, so a cold cache on the first pass doesn't decide it.
+        size, elapsed = min(
+            (_drain(PATHS[name]) for _ in range(args.repeat)), key=lambda r: r[1]
+        )
+        print(
+            f"{name:<13}{rows:>10}{size / 1e6:>9.1f}{elapsed:>10.2f}"
+            f"{rows / elapsed if elapsed else 0:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Payments/sec for each receipt allocator as the number of concurrent writers grows.
+
+Run against a scratch Postgres database that has been migrated to head; the
+benchmark inserts real payments:
+
+    DATABASE_URL=postgresql+psycopg://... python -m benchmarks.receipt_allocator
+"""
+
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+import uuid
+from datetime import UTC, datetime
+from decimal import Decimal
+
+from sqlalchemy import select
+
+from app.core.database import SessionLocal
+from app.models.enums import PaymentMode, UserRole
+from app.models.payment import Payment
+from app.models.student import Student
+from app.models.student_fee import StudentFee
+from app.models.user import User
+from app.services.receipts import (
+    BlockAllocator,
+    ReceiptAllocator,
+    RowLockAllocator,
+    SequenceAllocator,
+)
+
+
+def _fixture_ids() -> tuple[uuid.UUID, uuid.UUID]:
+    with SessionLocal() as db:
+        user = db.execute(select(User).where(User.username == "bench")).scalar_one_or_none()
+        if not user:
+            user = User(username="bench", password_hash="!", role=UserRole.admin)
+            db.add(user)
+        student = Student(student_code=f"BENCH-{uuid.uuid4().hex[:8]}", name="Benchmark")
+        student.fee = StudentFee(expected_fee_amount=0)
+        db.add(student)
+        db.commit()
+        return user.id, student.id
+
+
+def _writer(
+    allocator: ReceiptAllocator,
+    user_id: uuid.UUID,
+    student_id: uuid.UUID,
+    deadline: float,
+    counts: list[int],
+    slot: int,
+) -> None:
+    with SessionLocal() as db:
+        while time.perf_counter() < deadline:
+            (receipt_no,) = allocator.allocate(db)
+            db.add(
+                Payment(
+                    receipt_no=receipt_no,
+                    student_id=student_id,
+                    amount=Decimal("1.00"),
+                    mode=PaymentMode.cash,
+                    paid_at=datetime.now(UTC),
+                    created_by=user_id,
+                )
+            )
+            db.commit()
+            counts[slot] += 1
+
+
+def _run(mode: str, writers: int, seconds: float, block_size: int) -> float:
+    user_id, student_id = _fixture_ids()
+    if mode == "row_lock":
+        allocators = [RowLockAllocator()] * writers
+    elif mode == "sequence":
+        allocators = [SequenceAllocator()] * writers
+    else:
+        # One allocator per writer models one lease per uvicorn worker process.
+        allocators = [BlockAllocator(block_size) for _ in range(writers)]
+
+    counts = [0] * writers
+    deadline = time.perf_counter() + seconds
+    threads = [
+        threading.Thread(
+            target=_writer, args=(allocators[i], user_id, student_id, deadline, counts, i)
+        )
+        for i in range(writers)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts) / seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=["row_lock", "sequence", "block"])
+    parser.add_argument("--writers", nargs="+", type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--block-size", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10}{'writers':>8}{'payments/sec':>15}")
+    for mode in args.modes:
+        for writers in args.writers:
+            rate = _run(mode, writers, args.seconds, args.block_size)
+            print(f"{mode:<10}{writers:>8}{rate:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Student search latency with and without the pg_trgm indexes.
+
+Run against a scratch Postgres database migrated to head. --seed imports synthetic
+students through the bulk importer first (100,000 by default), so balances and
+rollups stay consistent:
+
+    DATABASE_URL=postgresql+psycopg://... python -m benchmarks.student_search --seed
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import string
+import time
+
+from sqlalchemy import select, text
+
+from app.core.database import SessionLocal, engine
+from app.models.enums import UserRole
+from app.models.student import Student
+from app.models.user import User
+from app.services import student_import, student_search
+
+_SYLLABLES = ["an", "ar", "ka", "ra", "vi", "sh", "ni", "ma", "de", "lo", "su", "ya", "pr", "ee"]
+
+
+def _name(rng: random.Random) -> str:
+    return " ".join(
+        "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))).title() for _ in range(2)
+    )
+
+
+def _seed(count: int) -> None:
+    rng = random.Random(42)
+    with SessionLocal() as db:
+        user = db.execute(select(User).where(User.username == "bench")).scalar_one_or_none()
+        if not user:
+            user = User(username="bench", password_hash="!", role=UserRole.admin)
+            db.add(user)
+            db.commit()
+        records = (
+            (
+                i,
+                {
+                    "student_code": f"SRCH-{i:06d}",
+                    "name": _name(rng),
+                    "class_name": str(rng.randint(1, 12)),
+                    "section": rng.choice(string.ascii_uppercase[:4]),
+                },
+            )
+            for i in range(count)
+        )
+        result = student_import.import_students(db, records, updated_by=user.id)
+    print(f"seeded: created={result.created} updated={result.updated} failed={result.failed}")
+
+
+def _time_query(term: str, use_index: bool, page_size: int) -> float:
+    with SessionLocal() as db:
+        if not use_index:
+            db.execute(text("SET LOCAL enable_bitmapscan = off"))
+            db.execute(text("SET LOCAL enable_indexscan = off"))
+        stmt = (
+            select(Student.id, Student.student_code, Student.name)
+            .where(student_search.matches(term))
+            .order_by(student_search.rank(db, term).desc(), Student.student_code)
+            .limit(page_size)
+        )
+        started = time.perf_counter()
+        db.execute(stmt).all()
+        return (time.perf_counter() - started) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", action="store_true")
+    parser.add_argument("--students", type=int, default=100_000)
+    parser.add_argument("--terms", nargs="+", default=["srch-0421", "anka", "vish", "maya"])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("the trigram indexes need Postgres; point DATABASE_URL at one")
+    if args.seed:
+        _seed(args.students)
+
+    print(f"{'term':<12}{'path':<10}{'p50 ms':>9}{'p95 ms':>9}")
+    for term in args.terms:
+        for use_index, label in ((False, "seqscan"), (True, "trigram")):
+            samples = sorted(_time_query(term, use_index, args.page_size) for _ in range(args.repeat))
+            p95 = samples[max(0, int(len(samples) * 0.95) - 1)]
+            print(f"{term:<12}{label:<10}{statistics.median(samples):>9.2f}{p95:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
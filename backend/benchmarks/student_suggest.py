@@ -0,0 +1,75 @@
+"""Memory and lookup latency of the in-memory student suggest index.
+
+Builds the index from synthetic students (100,000 by default) without a database,
+so it runs anywhere:
+
+    python -m benchmarks.student_suggest
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import string
+import time
+import tracemalloc
+import uuid
+
+from app.models.enums import StudentStatus
+from app.services.suggest import SuggestIndex
+
+from benchmarks.student_search import _name
+
+
+def _students(count: int) -> list[tuple]:
+    rng = random.Random(42)
+    return [
+        (
+            uuid.uuid4(),
+            f"SRCH-{i:06d}",
+            _name(rng),
+            str(rng.randint(1, 12)),
+            rng.choice(string.ascii_uppercase[:4]),
+            StudentStatus.active,
+        )
+        for i in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=100_000)
+    parser.add_argument("--terms", nargs="+", default=["srch-0421", "a", "anka", "vish ma"])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    students = _students(args.students)
+    index = SuggestIndex()
+    tracemalloc.start()
+    started = time.perf_counter()
+    index.load(students)
+    build_s = time.perf_counter() - started
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = index.stats()
+    print(
+        f"students={stats['students']} tokens={stats['tokens']} build={build_s:.2f}s "
+        f"traced={traced / 2**20:.1f} MiB reported={stats['bytes'] / 2**20:.1f} MiB"
+    )
+
+    print(f"{'term':<12}{'p50 ms':>9}{'p95 ms':>9}")
+    for term in args.terms:
+        samples = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            index.suggest(term, args.limit)
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        p95 = samples[max(0, int(len(samples) * 0.95) - 1)]
+        print(f"{term:<12}{statistics.median(samples):>9.3f}{p95:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
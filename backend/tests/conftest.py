@@ -29,16 +29,11 @@ def db_session():
                     s.id AS student_id,
                     s.student_code,
                     s.name,
-                    COALESCE(sf.expected_fee_amount, 0) AS expected_fee,
-                    COALESCE(p.paid_total, 0) AS paid_total,
-                    (COALESCE(sf.expected_fee_amount, 0) - COALESCE(p.paid_total, 0)) AS pending
+                    COALESCE(b.expected_fee, 0) AS expected_fee,
+                    COALESCE(b.paid_total, 0) AS paid_total,
+                    COALESCE(b.pending, 0) AS pending
                 FROM students s
-                LEFT JOIN student_fee sf ON sf.student_id = s.id
-                LEFT JOIN (
-                    SELECT student_id, SUM(amount) AS paid_total
-                    FROM payments
-                    GROUP BY student_id
-                ) p ON p.student_id = s.id;
+                LEFT JOIN student_balance b ON b.student_id = s.id;
                 """
             )
         )
@@ -1,3 +1,4 @@
+import uuid
 from decimal import Decimal
 
 from .conftest import auth_header
@@ -106,3 +107,913 @@ def test_pending_calculation_correct(client):
     row = next(r for r in rows if r["student_code"] == "S004")
     assert Decimal(row["pending"]) == Decimal("600")
 
+
+def test_bulk_payments_report_per_item_results(client):
+    headers = auth_header(client)
+    s = client.post(
+        "/api/students",
+        json={"student_code": "S005", "name": "Eve"},
+        headers=headers,
+    )
+    student_id = s.json()["id"]
+
+    resp = client.post(
+        "/api/payments/bulk",
+        json={
+            "items": [
+                {"student_id": student_id, "amount": 100, "mode": "cash"},
+                {"student_id": "00000000-0000-0000-0000-000000000000", "amount": 10, "mode": "cash"},
+                {"student_id": student_id, "amount": 0, "mode": "upi"},
+                {"student_id": student_id, "amount": 200, "mode": "bank"},
+            ]
+        },
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["accepted"] == 2
+    assert data["rejected"] == 2
+    assert [r["status"] for r in data["results"]] == ["accepted", "rejected", "rejected", "accepted"]
+    assert data["results"][1]["error"] == "Student not found"
+    receipts = {r["payment"]["receipt_no"] for r in data["results"] if r["status"] == "accepted"}
+    assert len(receipts) == 2
+
+    listing = client.get(f"/api/payments?student_id={student_id}", headers=headers)
+    assert listing.json()["total"] == 2
+
+
+def test_block_receipt_allocator_leases_unique_ranges(client, db_session, monkeypatch):
+    from app.core.config import settings
+    from app.models.receipt_sequence import ReceiptSequence
+    from app.services import receipts
+
+    # SQLite can't lease on a connection of its own, so "block" is Postgres-only.
+    assert isinstance(receipts._build_allocator("block"), receipts.RowLockAllocator)
+    monkeypatch.setattr(settings, "receipt_allocator", "block")
+    monkeypatch.setattr(receipts, "_allocators", {"block": receipts.BlockAllocator(3)})
+
+    headers = auth_header(client)
+    s = client.post(
+        "/api/students",
+        json={"student_code": "S006", "name": "Frank"},
+        headers=headers,
+    )
+    student_id = s.json()["id"]
+
+    receipt_nos = [
+        client.post(
+            "/api/payments",
+            json={"student_id": student_id, "amount": 10, "mode": "cash"},
+            headers=headers,
+        ).json()["receipt_no"]
+        for _ in range(4)
+    ]
+    assert receipt_nos == ["FEE-1", "FEE-2", "FEE-3", "FEE-4"]
+
+    seq = db_session.get(ReceiptSequence, 1)
+    db_session.refresh(seq)
+    assert seq.current_number == 6
+
+
+def test_partial_reversal_keeps_sign_and_original_notes(client):
+    headers = auth_header(client)
+    s = client.post(
+        "/api/students",
+        json={"student_code": "S007", "name": "Grace"},
+        headers=headers,
+    )
+    student_id = s.json()["id"]
+
+    p = client.post(
+        "/api/payments",
+        json={"student_id": student_id, "amount": 300, "mode": "upi", "notes": "term 1"},
+        headers=headers,
+    )
+    assert p.status_code == 201
+    original = p.json()
+
+    rev = client.post(
+        f"/api/payments/{original['id']}/reverse",
+        json={"reason": "Overcharged", "amount": 100},
+        headers=headers,
+    )
+    assert rev.status_code == 201
+    data = rev.json()
+    assert Decimal(data["amount"]) == Decimal("-100")
+    assert data["mode"] == "upi"
+    assert data["notes"] == f"REVERSAL of {original['receipt_no']}: Overcharged | orig_notes: term 1"
+
+    missing = client.post(
+        "/api/payments",
+        json={"student_id": "00000000-0000-0000-0000-000000000000", "amount": 5, "mode": "cash"},
+        headers=headers,
+    )
+    assert missing.status_code == 404
+
+
+def test_idempotency_key_replays_stored_payment(client, monkeypatch):
+    from datetime import datetime, timedelta
+
+    from app.core.config import settings
+    from app.services import idempotency
+
+    headers = auth_header(client)
+    s = client.post(
+        "/api/students",
+        json={"student_code": "S008", "name": "Heidi"},
+        headers=headers,
+    )
+    student_id = s.json()["id"]
+    body = {"student_id": student_id, "amount": 120, "mode": "cash"}
+
+    first = client.post("/api/payments", json=body, headers={**headers, "Idempotency-Key": "k-1"})
+    retry = client.post("/api/payments", json=body, headers={**headers, "Idempotency-Key": "k-1"})
+    assert first.status_code == 201
+    assert retry.status_code == 201
+    assert retry.json() == first.json()
+
+    payment_id = first.json()["id"]
+    rev_headers = {**headers, "Idempotency-Key": "k-2"}
+    rev1 = client.post(f"/api/payments/{payment_id}/reverse", json={"reason": "dup"}, headers=rev_headers)
+    rev2 = client.post(f"/api/payments/{payment_id}/reverse", json={"reason": "dup"}, headers=rev_headers)
+    assert rev1.json()["id"] == rev2.json()["id"]
+
+    reused = client.post("/api/payments", json=body, headers=rev_headers)
+    assert reused.status_code == 422
+
+    listing = client.get(f"/api/payments?student_id={student_id}", headers=headers)
+    assert listing.json()["total"] == 2
+
+    # A cached replay ends at the key's expires_at, not a full TTL after it was cached.
+    idempotency._cache.clear()
+    client.post("/api/payments", json=body, headers={**headers, "Idempotency-Key": "k-1"})
+
+    class Later(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.now(tz) + timedelta(hours=settings.idempotency_ttl_hours, minutes=1)
+
+    monkeypatch.setattr(idempotency, "datetime", Later)
+    late = client.post("/api/payments", json=body, headers={**headers, "Idempotency-Key": "k-1"})
+    assert late.status_code == 201
+    assert late.json()["id"] != first.json()["id"]
+
+
+def test_list_payments_cursor_pagination(client):
+    headers = auth_header(client)
+    s = client.post(
+        "/api/students",
+        json={"student_code": "S009", "name": "Ivan"},
+        headers=headers,
+    )
+    student_id = s.json()["id"]
+    client.post(
+        "/api/payments/bulk",
+        json={
+            "items": [
+                {
+                    "student_id": student_id,
+                    "amount": i + 1,
+                    "mode": "cash",
+                    "paid_at": f"2026-01-0{1 + i % 3}T10:00:00Z",
+                }
+                for i in range(5)
+            ]
+        },
+        headers=headers,
+    )
+
+    seen = []
+    cursor = None
+    while True:
+        params = f"student_id={student_id}&page_size=2&include_total=false"
+        if cursor:
+            params += f"&cursor={cursor}"
+        resp = client.get(f"/api/payments?{params}", headers=headers)
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["total"] is None
+        seen.extend(p["id"] for p in data["items"])
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+
+    full = client.get(f"/api/payments?student_id={student_id}&page_size=10", headers=headers).json()
+    assert full["total"] == 5
+    assert seen == [p["id"] for p in full["items"]]
+
+    bad = client.get("/api/payments?cursor=not-a-cursor", headers=headers)
+    assert bad.status_code == 422
+
+
+def test_list_count_strategies(client):
+    headers = auth_header(client)
+    client.post("/api/students", json={"student_code": "S010", "name": "Judy"}, headers=headers)
+
+    cached = client.get("/api/students?search=s010&count_strategy=cached", headers=headers).json()
+    assert cached["count_strategy"] == "cached"
+    assert cached["total"] == 1
+
+    client.post("/api/students", json={"student_code": "S0100", "name": "Judy 2"}, headers=headers)
+    cached = client.get("/api/students?search=s010&count_strategy=cached", headers=headers).json()
+    assert cached["total"] == 2
+
+    # SQLite has no planner estimates, so the exact count is used and reported.
+    estimated = client.get(
+        "/api/students/balances?search=s010&count_strategy=estimated", headers=headers
+    ).json()
+    assert estimated["count_strategy"] == "exact"
+    assert estimated["total"] == 2
+
+
+def test_balance_ledger_tracks_writes_and_rebuilds(client, db_session):
+    from app.models.student_balance import StudentBalance
+    from app.services import ledger
+
+    headers = auth_header(client)
+    s = client.post("/api/students", json={"student_code": "S011", "name": "Ken"}, headers=headers)
+    student_id = s.json()["id"]
+
+    client.patch(f"/api/students/{student_id}/fee", json={"expected_fee_amount": 900}, headers=headers)
+    p = client.post(
+        "/api/payments",
+        json={"student_id": student_id, "amount": 500, "mode": "cash"},
+        headers=headers,
+    )
+    client.post(f"/api/payments/{p.json()['id']}/reverse", json={"reason": "x", "amount": 200}, headers=headers)
+
+    balance = client.get(f"/api/students/{student_id}/balance", headers=headers).json()
+    assert Decimal(balance["paid_total"]) == Decimal("300")
+    assert Decimal(balance["pending"]) == Decimal("600")
+    assert ledger.find_drift(db_session) == []
+
+    row = db_session.get(StudentBalance, uuid.UUID(student_id))
+    row.paid_total = Decimal("1")
+    db_session.commit()
+    assert len(ledger.find_drift(db_session)) == 1
+    assert ledger.rebuild(db_session) == 1
+    assert ledger.find_drift(db_session) == []
+
+
+def test_pending_report_filters_in_sql_and_paginates(client):
+    headers = auth_header(client)
+    for code, fee, paid in [("P1", 1000, 1000), ("P2", 1000, 100), ("P3", 500, 0), ("P4", 300, 250)]:
+        sid = client.post("/api/students", json={"student_code": code, "name": code}, headers=headers).json()["id"]
+        client.patch(f"/api/students/{sid}/fee", json={"expected_fee_amount": fee}, headers=headers)
+        if paid:
+            client.post("/api/payments", json={"student_id": sid, "amount": paid, "mode": "cash"}, headers=headers)
+
+    rows = client.get("/api/reports/pending", headers=headers).json()
+    assert [r["student_code"] for r in rows] == ["P2", "P3", "P4"]
+
+    page = client.get("/api/reports/pending?min_pending=100&page=2&page_size=1", headers=headers).json()
+    assert [r["student_code"] for r in page] == ["P3"]
+
+    csv_body = client.get("/api/export/pending.csv?min_pending=600", headers=headers).text
+    assert csv_body.strip().splitlines()[1].startswith("P2,")
+    assert len(csv_body.strip().splitlines()) == 2
+
+
+def test_balance_cache_is_invalidated_by_writes(client):
+    headers = auth_header(client)
+    sid = client.post("/api/students", json={"student_code": "S012", "name": "Liam"}, headers=headers).json()["id"]
+    client.patch(f"/api/students/{sid}/fee", json={"expected_fee_amount": 700}, headers=headers)
+
+    before = client.get("/api/metrics/caches", headers=headers).json()["balance"]
+    assert Decimal(client.get(f"/api/students/{sid}/balance", headers=headers).json()["pending"]) == Decimal("700")
+    assert Decimal(client.get(f"/api/students/{sid}/balance", headers=headers).json()["pending"]) == Decimal("700")
+    after = client.get("/api/metrics/caches", headers=headers).json()["balance"]
+    assert after["hits"] == before["hits"] + 1
+    assert after["misses"] == before["misses"] + 1
+
+    client.post("/api/payments", json={"student_id": sid, "amount": 200, "mode": "cash"}, headers=headers)
+    assert Decimal(client.get(f"/api/students/{sid}/balance", headers=headers).json()["pending"]) == Decimal("500")
+
+    client.patch(f"/api/students/{sid}", json={"name": "Liam R"}, headers=headers)
+    assert client.get(f"/api/students/{sid}/balance", headers=headers).json()["name"] == "Liam R"
+
+    # A balance read before a write's eviction is not cached after it.
+    from app.services import balance_cache
+
+    stale = balance_cache.get(uuid.UUID(sid))
+    balance_cache.backend.delete(uuid.UUID(sid))
+    generation = balance_cache.generation()
+    client.post("/api/payments", json={"student_id": sid, "amount": 100, "mode": "cash"}, headers=headers)
+    balance_cache.put(stale, generation)
+    assert balance_cache.get(uuid.UUID(sid)) is None
+
+
+def test_daily_rollup_feeds_reports(client, db_session):
+    from app.services import rollups
+
+    headers = auth_header(client)
+    sid = client.post("/api/students", json={"student_code": "S013", "name": "Mia"}, headers=headers).json()["id"]
+    client.post(
+        "/api/payments/bulk",
+        json={
+            "items": [
+                {"student_id": sid, "amount": 100, "mode": "cash", "paid_at": "2026-03-01T09:00:00Z"},
+                {"student_id": sid, "amount": 40, "mode": "upi", "paid_at": "2026-03-01T18:00:00Z"},
+                {"student_id": sid, "amount": 25, "mode": "cash", "paid_at": "2026-03-02T08:00:00Z"},
+                {"student_id": sid, "amount": 10, "mode": "cash", "paid_at": "2026-03-03T12:00:00Z"},
+            ]
+        },
+        headers=headers,
+    )
+
+    daily = client.get("/api/reports/daily?date=2026-03-01", headers=headers).json()
+    assert {r["mode"]: Decimal(r["total"]) for r in daily} == {"cash": Decimal("100"), "upi": Decimal("40")}
+
+    summary = client.get(
+        "/api/reports/summary?from=2026-03-01T12:00:00Z&to=2026-03-03T00:00:00Z", headers=headers
+    ).json()
+    assert Decimal(summary["total_collected"]) == Decimal("65")
+
+    assert rollups.backfill(db_session) == 4
+    daily = client.get("/api/reports/daily?date=2026-03-02", headers=headers).json()
+    assert daily == [{"mode": "cash", "total": daily[0]["total"]}]
+    assert Decimal(daily[0]["total"]) == Decimal("25")
+
+
+def test_summary_is_cached_until_a_payment_is_written(client):
+    headers = auth_header(client)
+    sid = client.post("/api/students", json={"student_code": "S014", "name": "Noah"}, headers=headers).json()["id"]
+    client.patch(f"/api/students/{sid}/fee", json={"expected_fee_amount": 1000}, headers=headers)
+
+    first = client.get("/api/reports/summary", headers=headers).json()
+    second = client.get("/api/reports/summary", headers=headers).json()
+    assert second["as_of"] == first["as_of"]
+    assert second["stale_seconds"] >= 0
+
+    client.post("/api/payments", json={"student_id": sid, "amount": 150, "mode": "cash"}, headers=headers)
+    third = client.get("/api/reports/summary", headers=headers).json()
+    assert third["as_of"] != first["as_of"]
+    assert Decimal(third["today_total"]) == Decimal(first["today_total"]) + 150
+    assert Decimal(third["pending_total"]) == Decimal(first["pending_total"]) - 150
+
+
+def test_timeseries_buckets_and_fills_gaps(client):
+    headers = auth_header(client)
+    a = client.post(
+        "/api/students", json={"student_code": "S015", "name": "Olga", "class_name": "5"}, headers=headers
+    ).json()["id"]
+    b = client.post(
+        "/api/students", json={"student_code": "S016", "name": "Pia", "class_name": "6"}, headers=headers
+    ).json()["id"]
+    client.post(
+        "/api/payments/bulk",
+        json={
+            "items": [
+                {"student_id": a, "amount": 100, "mode": "cash", "paid_at": "2025-01-15T09:00:00Z"},
+                {"student_id": b, "amount": 50, "mode": "upi", "paid_at": "2025-01-20T09:00:00Z"},
+                {"student_id": a, "amount": 30, "mode": "cash", "paid_at": "2025-03-02T09:00:00Z"},
+            ]
+        },
+        headers=headers,
+    )
+
+    monthly = client.get(
+        "/api/reports/timeseries?from=2025-01-01&to=2025-03-31&bucket=month", headers=headers
+    ).json()
+    assert monthly["starts"] == ["2025-01-01", "2025-02-01", "2025-03-01"]
+    assert monthly["groups"] == ["all"]
+    assert [Decimal(v) for v in monthly["totals"][0]] == [Decimal("150"), Decimal("0"), Decimal("30")]
+
+    by_mode = client.get(
+        "/api/reports/timeseries?from=2025-01-13&to=2025-01-26&bucket=week&group_by=mode", headers=headers
+    ).json()
+    assert by_mode["starts"] == ["2025-01-13", "2025-01-20"]
+    assert by_mode["groups"] == ["cash", "upi"]
+    assert [Decimal(v) for v in by_mode["totals"][1]] == [Decimal("0"), Decimal("50")]
+
+    by_class = client.get(
+        "/api/reports/timeseries?from=2025-01-01&to=2025-03-31&bucket=month&group_by=class_name",
+        headers=headers,
+    ).json()
+    assert by_class["groups"] == ["5", "6"]
+    assert [Decimal(v) for v in by_class["totals"][0]] == [Decimal("100"), Decimal("0"), Decimal("30")]
+
+
+def test_by_class_rollup_follows_fees_payments_and_moves(client, db_session):
+    headers = auth_header(client)
+    ids = []
+    for code, class_name, section in [("S017", "7", "A"), ("S018", "7", "A"), ("S019", "7", None)]:
+        ids.append(
+            client.post(
+                "/api/students",
+                json={"student_code": code, "name": code, "class_name": class_name, "section": section},
+                headers=headers,
+            ).json()["id"]
+        )
+    for sid in ids:
+        client.patch(f"/api/students/{sid}/fee", json={"expected_fee_amount": 1000}, headers=headers)
+    client.post(
+        "/api/payments", json={"student_id": ids[0], "amount": 300, "mode": "cash"}, headers=headers
+    )
+
+    rows = client.get("/api/reports/by-class?class_name=7", headers=headers).json()
+    assert [(r["section"], r["student_count"]) for r in rows] == [(None, 1), ("A", 2)]
+    assert Decimal(rows[1]["expected_fee"]) == Decimal("2000")
+    assert Decimal(rows[1]["pending"]) == Decimal("1700")
+
+    client.patch(f"/api/students/{ids[0]}", json={"section": "B"}, headers=headers)
+    rows = {r["section"]: r for r in client.get("/api/reports/by-class?class_name=7", headers=headers).json()}
+    assert rows["A"]["student_count"] == 1
+    assert Decimal(rows["A"]["paid_total"]) == Decimal("0")
+    assert Decimal(rows["B"]["paid_total"]) == Decimal("300")
+
+    from app.services import class_rollup
+
+    before = client.get("/api/reports/by-class", headers=headers).json()
+    class_rollup.backfill(db_session)
+    assert client.get("/api/reports/by-class", headers=headers).json() == before
+
+
+def test_reports_and_listings_answer_if_none_match(client):
+    headers = auth_header(client)
+    sid = client.post(
+        "/api/students", json={"student_code": "S020", "name": "Quinn"}, headers=headers
+    ).json()["id"]
+
+    first = client.get("/api/reports/pending", headers=headers)
+    etag = first.headers["ETag"]
+    assert client.get("/api/students/balances", headers=headers).headers["ETag"] == etag
+
+    cached = client.get("/api/reports/pending", headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert client.get("/api/reports/pending", headers={"If-None-Match": etag}).status_code == 401
+
+    client.patch(f"/api/students/{sid}/fee", json={"expected_fee_amount": 500}, headers=headers)
+    fresh = client.get("/api/reports/pending", headers={**headers, "If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
+    assert any(r["student_code"] == "S020" for r in fresh.json())
+
+
+def test_csv_exports_stream_in_batches(client, monkeypatch):
+    from app.services import exports
+
+    monkeypatch.setattr(exports, "EXPORT_BATCH_SIZE", 2)
+    headers = auth_header(client)
+    sid = client.post(
+        "/api/students", json={"student_code": "S021", "name": "Rae, Jr.", "class_name": "9"}, headers=headers
+    ).json()["id"]
+    other = client.post(
+        "/api/students", json={"student_code": "S022", "name": "Sam"}, headers=headers
+    ).json()["id"]
+    for amount in (10, 20, 30, 40, 50):
+        client.post("/api/payments", json={"student_id": sid, "amount": amount, "mode": "cash"}, headers=headers)
+    client.post("/api/payments", json={"student_id": other, "amount": 5, "mode": "upi"}, headers=headers)
+
+    resp = client.get(f"/api/export/payments.csv?student_id={sid}", headers=headers)
+    assert resp.headers["content-type"].startswith("text/csv")
+    lines = resp.text.strip().splitlines()
+    assert lines[0].startswith("receipt_no,student_id,amount")
+    assert len(lines) == 6
+    assert all(f",{sid}," in line for line in lines[1:])
+
+    students = client.get("/api/export/students.csv", headers=headers).text.strip().splitlines()
+    assert students[1].startswith('S021,"Rae, Jr.",9,,active,')
+    assert client.get("/api/export/payments.csv?student_id=nope", headers=headers).status_code == 422
+
+
+def test_exports_in_columnar_and_compressed_formats(client, monkeypatch):
+    import gzip
+    import io
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    from app.services import exports
+
+    monkeypatch.setattr(exports, "EXPORT_BATCH_SIZE", 2)
+    monkeypatch.setattr(exports, "ARROW_BATCH_SIZE", 3)
+    headers = auth_header(client)
+    sid = client.post(
+        "/api/students", json={"student_code": "S023", "name": "Tess"}, headers=headers
+    ).json()["id"]
+    for amount, mode in [(10, "cash"), (20, "upi"), (30, "cash"), (40.5, "bank")]:
+        client.post("/api/payments", json={"student_id": sid, "amount": amount, "mode": mode}, headers=headers)
+
+    url = f"/api/export/payments.csv?student_id={sid}"
+    resp = client.get(url + "&format=parquet", headers=headers)
+    assert resp.headers["content-disposition"].endswith("payments.parquet")
+    table = pq.read_table(io.BytesIO(resp.content))
+    assert table.num_rows == 4
+    assert table.schema.field("amount").type == pa.decimal128(12, 2)
+    assert table.schema.field("paid_at").type == pa.timestamp("us", tz="UTC")
+    assert pa.types.is_dictionary(table.schema.field("mode").type)
+    assert str(table.column("student_id")[0].as_py()) == sid
+    assert sorted(str(v) for v in table.column("amount").to_pylist()) == ["10.00", "20.00", "30.00", "40.50"]
+
+    arrow = client.get(url + "&format=arrow", headers=headers).content
+    assert pa.ipc.open_file(pa.BufferReader(arrow)).read_all().num_rows == 4
+
+    plain = client.get(url, headers=headers).content
+    assert gzip.decompress(client.get(url + "&format=csv.gz", headers=headers).content) == plain
+    assert client.get(url + "&format=xlsx", headers=headers).status_code == 422
+
+
+def test_payments_csv_export_uses_copy_only_on_postgres(monkeypatch):
+    from datetime import UTC, datetime
+
+    from psycopg import sql
+    from sqlalchemy.dialects.postgresql import psycopg
+
+    from app.models.enums import StudentStatus
+    from app.services import exports
+
+    calls = []
+
+    def fake_copy(stmt, progress=None):
+        calls.append(("copy", stmt))
+        return iter([b"copied\n"])
+
+    def fake_csv(stmt, progress=None):
+        calls.append(("python", stmt))
+        return iter(["written\n"])
+
+    monkeypatch.setattr(exports, "copy_csv_chunks", fake_copy)
+    monkeypatch.setattr(exports, "csv_chunks", fake_csv)
+    sid = uuid.uuid4()
+    since = datetime(2026, 4, 1, tzinfo=UTC)
+
+    assert list(exports.export("payments", "csv", student_id=sid, from_dt=since)) == ["written\n"]
+    monkeypatch.setattr(exports.engine.dialect, "name", "postgresql")
+    assert list(exports.export("payments", "csv", student_id=sid, from_dt=since)) == [b"copied\n"]
+    assert list(exports.export("students", "csv")) == ["written\n"]
+    assert [path for path, _ in calls] == ["python", "copy", "python"]
+
+    # The COPY statement's parameters go to psycopg as they are, rendered client-side.
+    compiled = calls[1][1].compile(dialect=psycopg.dialect())
+    assert "to_char" in str(compiled)
+    params = {k: v for k, v in compiled.params.items() if isinstance(v, (uuid.UUID, datetime))}
+    assert params == {"student_id_1": sid, "paid_at_1": since}
+    assert sql.Literal(sid).as_string(None) == f"'{sid.hex}'::uuid"
+
+    compiled = exports.pending_query(status=StudentStatus.inactive).compile(dialect=psycopg.dialect())
+    assert compiled.params["status_1"] is StudentStatus.inactive
+    assert sql.Literal(compiled.params["status_1"]).as_string(None) == "'inactive'"
+
+
+def test_export_jobs_spool_to_disk_and_serve_ranges(client, db_session, monkeypatch, tmp_path):
+    from app.core.config import settings
+    from app.services import export_jobs
+
+    class InlineExecutor:
+        def submit(self, fn, *args):
+            fn(*args)
+
+    monkeypatch.setattr(settings, "export_spool_dir", str(tmp_path))
+    monkeypatch.setattr(export_jobs, "_executor", InlineExecutor())
+    headers = auth_header(client)
+    sid = client.post(
+        "/api/students", json={"student_code": "S024", "name": "Uma"}, headers=headers
+    ).json()["id"]
+    for amount in (11, 22, 33):
+        client.post("/api/payments", json={"student_id": sid, "amount": amount, "mode": "cash"}, headers=headers)
+
+    created = client.post(
+        "/api/export/jobs",
+        json={"kind": "payments", "format": "csv", "student_id": sid, "min_pending": 5},
+        headers=headers,
+    )
+    assert created.status_code == 202
+    job = created.json()
+    assert job["params"] == {"student_id": sid}
+
+    done = client.get(f"/api/export/jobs/{job['id']}", headers=headers)
+    assert done.status_code == 200
+    assert done.headers["content-type"].startswith("text/csv")
+    body = done.content
+    assert len(body.strip().splitlines()) == 4
+    assert (tmp_path / f"{job['id']}.csv").read_bytes() == body
+
+    partial = client.get(f"/api/export/jobs/{job['id']}", headers={**headers, "Range": "bytes=10-"})
+    assert partial.status_code == 206
+    assert partial.content == body[10:]
+
+    from app.models.export_job import ExportJob
+
+    row = db_session.get(ExportJob, uuid.UUID(job["id"]))
+    assert (row.rows_total, row.rows_done, row.bytes_written) == (3, 3, len(body))
+    row.expires_at = row.created_at
+    db_session.commit()
+    assert client.get(f"/api/export/jobs/{job['id']}", headers=headers).status_code == 410
+    assert export_jobs.purge_expired(db_session) == 1
+    assert not (tmp_path / f"{job['id']}.csv").exists()
+
+
+def test_bulk_student_import_upserts_and_reports_rows(client, db_session):
+    headers = auth_header(client)
+    sid = client.post(
+        "/api/students", json={"student_code": "IMP1", "name": "Old", "class_name": "3", "section": "A"}, headers=headers
+    ).json()["id"]
+    client.patch(f"/api/students/{sid}/fee", json={"expected_fee_amount": 1000}, headers=headers)
+    client.post("/api/payments", json={"student_id": sid, "amount": 400, "mode": "cash"}, headers=headers)
+
+    csv_body = (
+        "student_code,name,class_name,section,expected_fee_amount\n"
+        "IMP1,Renamed,3,B,1200\n"
+        "IMP2,\"Two, Jr.\",3,B,500\n"
+        "IMP3,Three,3,,\n"
+        "IMP4,Four,3,B,-5\n"
+        "IMP2,Again,3,B,\n"
+        ",Nameless,3,B,\n"
+    )
+    resp = client.post(
+        "/api/students/import", files={"file": ("students.csv", csv_body, "text/csv")}, headers=headers
+    )
+    assert resp.status_code == 200
+    report = resp.json()
+    assert (report["created"], report["updated"], report["failed"]) == (2, 1, 3)
+    assert [(e["line"], e["student_code"]) for e in report["errors"]] == [(5, "IMP4"), (6, "IMP2"), (7, None)]
+
+    balance = client.get(f"/api/students/{sid}/balance", headers=headers).json()
+    assert balance["name"] == "Renamed"
+    assert Decimal(balance["pending"]) == Decimal("800")
+    rows = {r["section"]: r for r in client.get("/api/reports/by-class?class_name=3", headers=headers).json()}
+    assert rows["B"]["student_count"] == 2
+    assert Decimal(rows["B"]["expected_fee"]) == Decimal("1700")
+    assert Decimal(rows["B"]["paid_total"]) == Decimal("400")
+    assert rows[None]["student_count"] == 1
+    assert "A" not in rows
+
+    jsonl = '{"student_code": "IMP3", "name": "Three", "class_name": "3", "status": "inactive"}\nnot json\n'
+    report = client.post(
+        "/api/students/import", files={"file": ("more.jsonl", jsonl)}, headers=headers
+    ).json()
+    assert (report["created"], report["updated"], report["failed"]) == (0, 1, 1)
+    assert report["errors"][0]["line"] == 2
+
+    from app.services import ledger
+
+    assert ledger.find_drift(db_session) == []
+    listed = client.get("/api/students?search=imp3", headers=headers).json()
+    assert listed["items"][0]["status"] == "inactive"
+
+
+def test_student_search_ranks_exact_and_prefix_matches_first(client):
+    headers = auth_header(client)
+    for code, name in [("AB-100", "Zed Rowe"), ("ROW-1", "Alice"), ("ZZ-9", "Rowan"), ("R_W", "Percent% Kid")]:
+        client.post("/api/students", json={"student_code": code, "name": name}, headers=headers)
+
+    items = client.get("/api/students?search=row", headers=headers).json()["items"]
+    assert [s["student_code"] for s in items] == ["ROW-1", "ZZ-9", "AB-100"]
+
+    exact = client.get("/api/students/balances?search=zz-9", headers=headers).json()
+    assert [s["student_code"] for s in exact["items"]] == ["ZZ-9"]
+
+    literal = client.get("/api/students?search=r_w", headers=headers).json()["items"]
+    assert [s["student_code"] for s in literal] == ["R_W"]
+    assert client.get("/api/students?search=%25", headers=headers).json()["total"] == 1
+
+
+def test_student_suggest_serves_prefixes_from_memory(client, db_session):
+    from app.models.student import Student
+    from app.services import suggest
+
+    suggest.rebuild(db_session)
+    headers = auth_header(client)
+    created = {}
+    for code, name in [("S-10", "Ravi Kumar"), ("S-11", "Kumari Devi"), ("T-1", "Asha Rao")]:
+        resp = client.post("/api/students", json={"student_code": code, "name": name}, headers=headers)
+        created[code] = resp.json()["id"]
+
+    def codes(q: str) -> list[str]:
+        resp = client.get("/api/students/suggest", params={"q": q}, headers=headers)
+        assert resp.status_code == 200
+        return [s["student_code"] for s in resp.json()]
+
+    assert codes("s-1") == ["S-10", "S-11"]
+    assert codes("kum") == ["S-11", "S-10"]
+    assert codes("kumar ra") == ["S-10"]
+    assert codes("t-1") == ["T-1"]
+
+    client.patch(f"/api/students/{created['T-1']}", json={"name": "Asha Menon"}, headers=headers)
+    assert codes("rao") == []
+    assert codes("men") == ["T-1"]
+
+    client.post(
+        "/api/students/import",
+        files={
+            "file": (
+                "students.jsonl",
+                b'{"student_code": "U-1", "name": "Ravina Shah"}\n'
+                b'{"student_code": "S-11", "name": "Kumari Ravel"}\n',
+            )
+        },
+        headers=headers,
+    )
+    assert codes("rav") == ["S-10", "U-1", "S-11"]
+    assert codes("devi") == []
+
+    # A refresh re-reading applied rows, or a batch of class changes only, keeps the
+    # token list instead of rebuilding it.
+    tokens = suggest.index._tokens
+    rows = [suggest.entry(s) for s in db_session.query(Student).all()]
+    suggest.index.upsert(rows)
+    suggest.index.upsert((*row[:3], "8", *row[4:]) for row in rows)
+    assert suggest.index._tokens is tokens
+    assert {s["class_name"] for s in client.get("/api/students/suggest?q=s-", headers=headers).json()} == {"8"}
+
+    stats =client.get("/api/metrics/caches", headers=headers).json()["suggest"]
+    assert stats["students"] == 4 and stats["bytes"] > 0
+
+
+def test_bulk_fee_assignment_by_selector_and_items(client):
+    headers = auth_header(client)
+    ids = {}
+    for code, class_name in [("F-1", "5"), ("F-2", "5"), ("F-3", "6")]:
+        resp = client.post(
+            "/api/students",
+            json={"student_code": code, "name": code, "class_name": class_name},
+            headers=headers,
+        )
+        ids[code] = resp.json()["id"]
+    client.post(
+        "/api/payments",
+        json={"student_id": ids["F-1"], "amount": "300.00", "mode": "cash"},
+        headers=headers,
+    )
+
+    resp = client.patch(
+        "/api/students/fees",
+        json={"expected_fee_amount": "1000.00", "class_name": "5"},
+        headers=headers,
+    )
+    assert resp.json() == {"updated": 2}
+    fee = client.get(f"/api/students/{ids['F-2']}/fee", headers=headers).json()
+    assert Decimal(fee["expected_fee_amount"]) == Decimal("1000.00")
+    assert fee["last_fee_updated_by"] is not None
+    balance = client.get(f"/api/students/{ids['F-1']}/balance", headers=headers).json()
+    assert Decimal(balance["pending"]) == Decimal("700.00")
+
+    resp = client.patch(
+        "/api/students/fees",
+        json={"items": [{"student_id": ids["F-3"], "expected_fee_amount": "1200.00"}]},
+        headers=headers,
+    )
+    assert resp.json() == {"updated": 1}
+    rollup = client.get("/api/reports/by-class?class_name=6", headers=headers).json()
+    assert Decimal(rollup[0]["expected_fee"]) == Decimal("1200.00")
+
+    nobody = client.patch(
+        "/api/students/fees",
+        json={"expected_fee_amount": "1.00", "class_name": "no-such-class"},
+        headers=headers,
+    )
+    assert nobody.json() == {"updated": 0}
+    rollup = client.get("/api/reports/by-class?class_name=5", headers=headers).json()
+    assert Decimal(rollup[0]["expected_fee"]) == Decimal("2000.00")
+
+    assert client.patch(
+        "/api/students/fees", json={"expected_fee_amount": "1.00"}, headers=headers
+    ).status_code == 422
+
+
+def test_promotion_moves_classes_once_and_graduates(client):
+    headers = auth_header(client)
+    ids = {}
+    students = [("P-1", "5"), ("P-2", "6"), ("P-3", "12"), ("P-4", "5"), ("P-5", "11")]
+    for code, class_name in students:
+        resp = client.post(
+            "/api/students",
+            json={"student_code": code, "name": code, "class_name": class_name},
+            headers=headers,
+        )
+        ids[code] = resp.json()["id"]
+    client.patch(f"/api/students/{ids['P-4']}", json={"status": "inactive"}, headers=headers)
+    # "12" is both a move target and a graduating class: only its old students graduate.
+    mapping = {"5": "6", "6": "7", "11": "12", "12": None}
+
+    dry = client.post("/api/students/promote", json={"mapping": mapping, "dry_run": True}, headers=headers)
+    assert dry.json() == {"dry_run": True, "counts": {"5": 1, "6": 1, "11": 1, "12": 1}}
+    assert client.get(f"/api/students/{ids['P-1']}", headers=headers).json()["class_name"] == "5"
+
+    resp = client.post("/api/students/promote", json={"mapping": mapping}, headers=headers)
+    assert resp.json() == {"dry_run": False, "counts": {"5": 1, "6": 1, "11": 1, "12": 1}}
+    students = {
+        s["student_code"]: s for s in client.get("/api/students", headers=headers).json()["items"]
+    }
+    assert students["P-1"]["class_name"] == "6"
+    assert students["P-2"]["class_name"] == "7"
+    assert students["P-3"]["class_name"] == "12" and students["P-3"]["status"] == "inactive"
+    assert students["P-4"]["class_name"] == "5"
+    assert students["P-5"]["class_name"] == "12" and students["P-5"]["status"] == "active"
+    suggested = client.get("/api/students/suggest?q=p-5", headers=headers).json()
+    assert [(s["class_name"], s["status"]) for s in suggested] == [("12", "active")]
+
+    by_class = client.get("/api/reports/by-class?class_name=7", headers=headers).json()
+    assert by_class[0]["student_count"] == 1
+
+
+def test_authenticated_users_are_cached_and_evicted_on_change(client, db_session, monkeypatch):
+    from app.core.config import settings
+    from app.core.security import hash_password
+    from app.models.enums import UserRole
+    from app.models.user import User
+    from app.services import principals
+
+    clerk = User(username="clerk", password_hash=hash_password("clerk123"), role=UserRole.admin)
+    db_session.add(clerk)
+    db_session.commit()
+    token = client.post("/api/auth/login", json={"username": "clerk", "password": "clerk123"}).json()
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+    before = principals.stats()["hits"]
+    assert client.get("/api/auth/me", headers=headers).json()["username"] == "clerk"
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+    assert principals.stats()["hits"] > before
+
+    clerk.username = "clerk2"
+    db_session.commit()
+    assert client.get("/api/auth/me", headers=headers).json()["username"] == "clerk2"
+
+    monkeypatch.setattr(settings, "jwt_trust_claims", True)
+    db_session.delete(clerk)
+    db_session.commit()
+    # Signed claims are taken as-is; no lookup, so the deleted user still passes.
+    assert client.get("/api/auth/me", headers=headers).json()["username"] == "clerk"
+
+    monkeypatch.setattr(settings, "jwt_trust_claims", False)
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+
+
+def test_refresh_token_flow_and_login_backpressure(client, monkeypatch):
+    import threading
+
+    from app.services import passwords
+
+    tokens = client.post("/api/auth/login", json={"username": "admin", "password": "admin123"}).json()
+    refresh_token = tokens["refresh_token"]
+    # A refresh token is not an access token.
+    assert client.get(
+        "/api/auth/me", headers={"Authorization": f"Bearer {refresh_token}"}
+    ).status_code == 401
+
+    resp = client.post("/api/auth/refresh", json={"refresh_token": refresh_token})
+    assert resp.status_code == 200
+    access = resp.json()["access_token"]
+    me = client.get("/api/auth/me", headers={"Authorization": f"Bearer {access}"})
+    assert me.json()["username"] == "admin"
+    assert client.post(
+        "/api/auth/refresh", json={"refresh_token": tokens["access_token"]}
+    ).status_code == 401
+
+    full = threading.BoundedSemaphore(1)
+    full.acquire()
+    monkeypatch.setattr(passwords, "_slots", full)
+    resp = client.post("/api/auth/login", json={"username": "admin", "password": "admin123"})
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == "1"
+
+
+def test_login_waiting_on_a_hash_holds_no_threadpool_thread(db_session, monkeypatch):
+    import threading
+    from concurrent.futures import Future
+
+    import anyio.to_thread
+    from fastapi.testclient import TestClient
+
+    from app.main import create_app
+    from app.services import passwords
+
+    with TestClient(create_app()) as client:
+        headers = auth_header(client)
+
+        pending: Future = Future()
+        submitted = threading.Event()
+
+        class StuckPool:
+            def submit(self, *_args):
+                submitted.set()
+                return pending
+
+        monkeypatch.setattr(passwords, "_executor", lambda: StuckPool())
+
+        def one_thread() -> None:
+            anyio.to_thread.current_default_thread_limiter().total_tokens = 1
+
+        client.portal.call(one_thread)
+        results = {}
+        login = threading.Thread(
+            target=lambda: results.update(
+                login=client.post("/api/auth/login", json={"username": "admin", "password": "admin123"})
+            )
+        )
+        login.start()
+        assert submitted.wait(5)
+
+        # The only threadpool thread is free while the login waits on its hash.
+        me = threading.Thread(
+            target=lambda: results.update(me=client.get("/api/auth/me", headers=headers))
+        )
+        me.start()
+        me.join(5)
+        assert not me.is_alive() and results["me"].status_code == 200
+
+        pending.set_result(True)
+        login.join(5)
+        assert results["login"].status_code == 200